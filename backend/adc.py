@@ -1,5 +1,7 @@
 # ADC driver with simulated fallback
 import time, random
+import threading
+from metrics import timed
 try:
     import smbus
     HARDWARE = True
@@ -10,6 +12,8 @@ class ADC:
     def __init__(self, simulate=False):
         self.simulate = simulate or (not HARDWARE)
         self.pcb_version = 2
+        # read_adc is called from the battery monitor thread and the main loop
+        self._lock = threading.Lock()
         if not self.simulate:
             self.I2C_ADDRESS = 0x48
             self.ADS7830_COMMAND = 0x84
@@ -28,6 +32,7 @@ class ADC:
                 if value1 == value2:
                     return value1
 
+    @timed("adc.read")
     def read_adc(self, channel: int) -> float:
         if self.simulate:
             # simulate light sensors and battery voltage slightly varying
@@ -39,8 +44,9 @@ class ADC:
                 return 0.0
         else:
             command_set = self.ADS7830_COMMAND | ((((channel << 2) | (channel >> 1)) & 0x07) << 4)
-            self.i2c_bus.write_byte(self.I2C_ADDRESS, command_set)
-            value = self._read_stable_byte()
+            with self._lock:
+                self.i2c_bus.write_byte(self.I2C_ADDRESS, command_set)
+                value = self._read_stable_byte()
             voltage = value / 255.0 * self.adc_voltage_coefficient
             return round(voltage, 2)
 
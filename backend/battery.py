@@ -0,0 +1,110 @@
+# battery.py — Filtered battery voltage and motor duty compensation
+import threading
+import time
+
+# Pack voltage the control gains were tuned at (same reference as Car.mode_rotate)
+NOMINAL_VOLTAGE = 7.5
+# ADC channel wired to the battery divider
+BATTERY_CHANNEL = 2
+
+
+class BatteryMonitor:
+    def __init__(self, adc, nominal=NOMINAL_VOLTAGE, interval=0.5, alpha=0.2,
+                 min_scale=0.85, max_scale=1.35, min_valid=3.0, max_step=1.0):
+        """
+        Background battery model.
+
+        Samples ADC channel 2 every `interval` seconds (off the control loop,
+        so no motion path pays for an I2C read) and keeps an exponentially
+        smoothed pack voltage (`alpha` per sample). Readings below min_valid
+        or jumping more than max_step volts from the filtered value are
+        treated as glitches and skipped (motor start-up sag, loose wire);
+        a jump that persists for several samples (pack swapped) resets the
+        filter.
+
+        `scale` is the duty multiplier that makes a duty produce roughly the
+        same wheel speed as at the nominal voltage; it is clamped to
+        [min_scale, max_scale] so a dying pack cannot ask for full power.
+        """
+        self.adc = adc
+        self.nominal = nominal
+        self.interval = interval
+        self.alpha = alpha
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.min_valid = min_valid
+        self.max_step = max_step
+        self.voltage = None
+        self.raw = None
+        self.samples = 0
+        self.rejected = 0
+        self._jumps = 0
+        self.updated = 0.0
+        self._running = False
+        self._thread = None
+
+    def _read_pack_voltage(self):
+        multiplier = 3 if getattr(self.adc, "pcb_version", 2) == 1 else 2
+        return self.adc.read_adc(BATTERY_CHANNEL) * multiplier
+
+    def sample(self):
+        """Take one reading and update the filter; returns the filtered voltage."""
+        try:
+            v = self._read_pack_voltage()
+        except Exception:
+            self.rejected += 1
+            return self.voltage
+        self.raw = v
+        if v < self.min_valid:
+            self.rejected += 1
+            return self.voltage
+        if self.voltage is not None and abs(v - self.voltage) > self.max_step:
+            self._jumps += 1
+            if self._jumps < 5:
+                self.rejected += 1
+                return self.voltage
+            self.voltage = None
+        self._jumps = 0
+        self.voltage = v if self.voltage is None else self.voltage + self.alpha * (v - self.voltage)
+        self.samples += 1
+        self.updated = time.time()
+        return self.voltage
+
+    @property
+    def scale(self):
+        """Duty multiplier for the current filtered voltage (1.0 until the first sample)."""
+        if not self.voltage:
+            return 1.0
+        ideal = self.nominal / self.voltage
+        return max(self.min_scale, min(self.max_scale, ideal))
+
+    def residual(self):
+        """Compensation the clamped duty scale could not provide (>1 means still slower than nominal)."""
+        if not self.voltage:
+            return 1.0
+        return (self.nominal / self.voltage) / self.scale
+
+    # --- lifecycle ---
+    def start(self):
+        self.sample()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="battery", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while self._running:
+            time.sleep(self.interval)
+            self.sample()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+
+    def snapshot(self):
+        return {
+            "voltage": None if self.voltage is None else round(self.voltage, 2),
+            "raw": None if self.raw is None else round(self.raw, 2),
+            "scale": round(self.scale, 3),
+            "age": None if not self.updated else round(time.time() - self.updated, 1),
+        }
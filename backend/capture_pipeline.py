@@ -0,0 +1,287 @@
+# capture_pipeline.py — Bounded, staged image capture (grab -> encode -> write -> notify)
+import io
+import os
+import json
+import queue
+import threading
+import time
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except Exception:
+    HAS_PIL = False
+
+DROP_NEWEST = "drop_newest"   # reject the new request when the queue is full
+DROP_OLDEST = "drop_oldest"   # evict the oldest pending request to make room
+BLOCK = "block"               # wait (up to block_timeout) for a free slot
+DROP_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+STAGES = ("grab", "encode", "write", "notify")
+
+
+class StageStats:
+    """Thread-safe latency accumulator for one pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds: float, ok: bool = True):
+        with self._lock:
+            self.count += 1
+            if not ok:
+                self.errors += 1
+            self.total += seconds
+            self.last = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.total / self.count if self.count else 0.0
+            return {
+                "count": self.count,
+                "errors": self.errors,
+                "avg_ms": round(avg * 1000, 2),
+                "max_ms": round(self.max * 1000, 2),
+                "last_ms": round(self.last * 1000, 2),
+            }
+
+
+class CapturePipeline:
+    def __init__(self, camera, mqtt=None, image_topic=None, workers=2, queue_size=8,
+                 drop_policy=DROP_OLDEST, block_timeout=0.5, jpeg_quality=85,
+                 thumb_size=(160, 120), thumb_dir=None, url_prefix="http://<RPI_IP>:5000/images/"):
+        """
+        Capture pipeline with a bounded request queue and a fixed worker pool.
+
+        A single grab thread owns the camera (Picamera2 is not safe to drive
+        from several threads) and hands raw frames to `workers` threads that
+        JPEG-encode the full image and a thumbnail, write both to disk and
+        publish the image URL over MQTT.
+
+        drop_policy: one of DROP_NEWEST, DROP_OLDEST, BLOCK
+        thumb_dir: where thumbnails go (default: <capture dir>/thumbs)
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.camera = camera
+        self.mqtt = mqtt
+        self.image_topic = image_topic
+        self.workers = max(1, int(workers))
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.jpeg_quality = jpeg_quality
+        self.thumb_size = thumb_size
+        self.thumb_dir = thumb_dir
+        self.url_prefix = url_prefix
+
+        self._requests = queue.Queue(maxsize=queue_size)
+        self._frames = queue.Queue(maxsize=max(1, self.workers * 2))
+        self._stop = threading.Event()
+        self._threads = []
+        self._started_camera = False
+
+        self.stats = {stage: StageStats() for stage in STAGES}
+        self._counter_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+
+    # --- lifecycle ---
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        grab = threading.Thread(target=self._grab_loop, name="capture-grab", daemon=True)
+        grab.start()
+        self._threads.append(grab)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"capture-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[CAPTURE] Pipeline started (workers={self.workers}, queue={self._requests.maxsize}, policy={self.drop_policy})")
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+        if self._started_camera:
+            try:
+                self.camera.camera.stop()
+            except Exception:
+                pass
+            self._started_camera = False
+        print("[CAPTURE] Pipeline stopped.")
+
+    # --- public interface ---
+    def submit(self, path: str, origin: str = "manual") -> bool:
+        """
+        Queue a capture to be written to `path`.
+        Returns False if the request was dropped by the drop policy.
+        """
+        req = {"path": path, "origin": origin, "requested": time.time()}
+        with self._counter_lock:
+            self.submitted += 1
+
+        if self.drop_policy == BLOCK:
+            try:
+                self._requests.put(req, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                return self._drop(req)
+
+        try:
+            self._requests.put_nowait(req)
+            return True
+        except queue.Full:
+            if self.drop_policy == DROP_NEWEST:
+                return self._drop(req)
+
+        # DROP_OLDEST: evict until the new request fits
+        while True:
+            try:
+                old = self._requests.get_nowait()
+                self._drop(old)
+            except queue.Empty:
+                pass
+            try:
+                self._requests.put_nowait(req)
+                return True
+            except queue.Full:
+                continue
+
+    def get_stats(self) -> dict:
+        with self._counter_lock:
+            counters = {
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "completed": self.completed,
+            }
+        counters["pending"] = self._requests.qsize()
+        counters["stages"] = {stage: s.snapshot() for stage, s in self.stats.items()}
+        return counters
+
+    # --- internal helpers ---
+    def _drop(self, req) -> bool:
+        with self._counter_lock:
+            self.dropped += 1
+        print(f"[CAPTURE] Dropped capture request: {req['path']}")
+        return False
+
+    def _ensure_camera_started(self):
+        try:
+            cam = getattr(self.camera, "camera", None)
+            if cam is not None and not getattr(cam, "started", False) and hasattr(cam, "start"):
+                cam.start()
+                self._started_camera = True
+        except Exception as e:
+            print("[CAPTURE] Could not start camera:", e)
+
+    def _grab(self):
+        """Grab one frame from the camera as a PIL image (or None)."""
+        cam = self.camera.camera
+        if hasattr(cam, "capture_image"):
+            return cam.capture_image("main")
+        return None
+
+    def _grab_loop(self):
+        while not self._stop.is_set():
+            try:
+                req = self._requests.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            self._ensure_camera_started()
+            t0 = time.perf_counter()
+            frame = None
+            try:
+                frame = self._grab()
+            except Exception as e:
+                print("[CAPTURE] Grab error:", e)
+            self.stats["grab"].record(time.perf_counter() - t0, ok=frame is not None)
+            if frame is None:
+                continue
+
+            req["frame"] = frame
+            # Never block the grab thread indefinitely on slow disks
+            while not self._stop.is_set():
+                try:
+                    self._frames.put(req, timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+
+    def _encode(self, frame):
+        """Return (full_jpeg_bytes, thumb_jpeg_bytes)."""
+        if not HAS_PIL:
+            raise RuntimeError("Pillow is required for JPEG encoding")
+        if frame.mode not in ("RGB", "L"):
+            frame = frame.convert("RGB")
+        buf = io.BytesIO()
+        frame.save(buf, format="JPEG", quality=self.jpeg_quality)
+        full = buf.getvalue()
+
+        thumb_img = frame.copy()
+        thumb_img.thumbnail(self.thumb_size)
+        buf = io.BytesIO()
+        thumb_img.save(buf, format="JPEG", quality=75)
+        return full, buf.getvalue()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                req = self._frames.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            path = req["path"]
+
+            t0 = time.perf_counter()
+            try:
+                full, thumb = self._encode(req.pop("frame"))
+                self.stats["encode"].record(time.perf_counter() - t0)
+            except Exception as e:
+                self.stats["encode"].record(time.perf_counter() - t0, ok=False)
+                print("[CAPTURE] Encode error:", e)
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._write_atomic(path, full)
+                thumb_dir = self.thumb_dir or os.path.join(os.path.dirname(path), "thumbs")
+                os.makedirs(thumb_dir, exist_ok=True)
+                self._write_atomic(os.path.join(thumb_dir, os.path.basename(path)), thumb)
+                self.stats["write"].record(time.perf_counter() - t0)
+                print(f"[CAM] Saved image: {path}")
+            except Exception as e:
+                self.stats["write"].record(time.perf_counter() - t0, ok=False)
+                print("[CAPTURE] Write error:", e)
+                continue
+
+            if self.mqtt is not None and self.image_topic:
+                t0 = time.perf_counter()
+                try:
+                    image_url = f"{self.url_prefix}{os.path.basename(path)}"
+                    self.mqtt.publish(self.image_topic, json.dumps({"url": image_url, "origin": req["origin"]}))
+                    self.stats["notify"].record(time.perf_counter() - t0)
+                    print(f"[MQTT] Published image URL: {image_url}")
+                except Exception as e:
+                    self.stats["notify"].record(time.perf_counter() - t0, ok=False)
+                    print("[CAPTURE] Notify error:", e)
+
+            with self._counter_lock:
+                self.completed += 1
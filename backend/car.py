@@ -1,11 +1,16 @@
 # car.py
-import time, math
+import time
 from adc import ADC
 from infrared import Infrared
 from ultrasonic import Ultrasonic
 from motor import Ordinary_Car
 #from servo import Servo
 from buzzer import Buzzer
+from battery import BatteryMonitor
+import maneuvers
+from log import get_logger
+
+_sensor_log = get_logger("sensors").throttle(interval=1.0)
 
 # import new LED controller
 try:
@@ -24,6 +29,8 @@ class Car:
         self.adc = None
         self.buzzer = None
         self.leds = None
+        self.battery = None
+        self.maneuvers = None
         self.car_record_time = time.time()
         self.car_sonic_servo_angle = 90   # Center by default
         self.car_sonic_servo_dir = 1
@@ -40,6 +47,14 @@ class Car:
         self.adc = ADC(simulate=self.simulate)
         self.buzzer = Buzzer(simulate=self.simulate)
 
+        # Filtered pack voltage, applied as a duty scale in the motor layer
+        self.battery = BatteryMonitor(self.adc)
+        self.battery.start()
+        self.motor.compensation = self.battery
+
+        # Time-stepped motion primitives advanced by the control loop
+        self.maneuvers = maneuvers.ManeuverRunner(self.motor)
+
         # Init LED controller if available
         try:
             if Led is not None:
@@ -66,6 +81,10 @@ class Car:
             self.motor.set_motor_model(0,0,0,0)
         except Exception:
             pass
+        try:
+            self.battery.stop()
+        except Exception:
+            pass
         for comp in (self.sonic, self.motor, self.infrared, self.adc, self.servo, self.buzzer):
             try:
                 comp.close()
@@ -83,6 +102,10 @@ class Car:
 
     # ---------- Combined Infrared + Ultrasonic ----------
     def mode_infrared_ultrasonic(self):
+        """One non-blocking step; call every loop tick."""
+        if self.maneuvers.tick():
+            # Reversing away from an obstacle
+            return
         if (time.time() - self.car_record_time) > 0.2:
             self.car_record_time = time.time()
             ir_value = self.infrared.read_all_infrared()
@@ -90,10 +113,7 @@ class Car:
             mid = (ir_value >> 1) & 1
             right = ir_value & 1
             distance = self.sonic.get_distance()
-            try:
-                print(f"[SENSORS] IR={ir_value:03b} (L:{left} M:{mid} R:{right}) | Distance={distance:.1f}cm")
-            except Exception:
-                print(f"[SENSORS] IR={ir_value:03b} | Distance={distance}")
+            _sensor_log.info("reading", left=left, mid=mid, right=right, distance=distance)
 
             if mid:
                 if distance > 30:
@@ -101,10 +121,7 @@ class Car:
                     self.motor.set_motor_model(800, 800, 800, 800)
                 else:
                     print("[ACTION] Line detected & obstacle ahead — reversing")
-                    self.motor.set_motor_model(-600, -600, -600, -600)
-                    time.sleep(0.3)
-                    self.motor.set_motor_model(-400, -400, 400, 400)
-                    time.sleep(0.3)
+                    self.maneuvers.start(maneuvers.reverse_and_turn(self.motor), "reverse_and_turn")
             else:
                 print("[ACTION] No line detected — stop")
                 self.motor.set_motor_model(0, 0, 0, 0)
@@ -120,21 +137,19 @@ class Car:
                 except Exception:
                     pass
 
-    # ---------- Rotation (unchanged) ----------
+    # ---------- Rotation ----------
     def mode_rotate(self, n):
-        angle = n
-        bat_compensate = 7.5 / (self.adc.read_adc(2) * (3 if self.adc.pcb_version == 1 else 2))
-        while True:
-            W = 2000
-            VY = int(2000 * math.cos(math.radians(angle)))
-            VX = -int(2000 * math.sin(math.radians(angle)))
-            FR = VY - VX + W
-            FL = VY + VX - W
-            BL = VY - VX - W
-            BR = VY + VX + W
-            self.motor.set_motor_model(FL, BL, FR, BR)
-            time.sleep(5 * self.time_compensate * bat_compensate / 1000)
-            angle -= 5
+        """
+        Start the mecanum rotate sweep from angle n and return immediately.
+        It runs on self.maneuvers until stopped (self.maneuvers.stop()).
+        """
+        # Duties are already battery-scaled; only stretch timing by what the clamp left over
+        bat_compensate = self.battery.residual()
+        self.maneuvers.start(
+            maneuvers.rotate_sweep(self.motor, start_angle=n, step=5,
+                                   step_seconds=5 * self.time_compensate / 1000,
+                                   time_scale=bat_compensate),
+            "rotate")
 
     # ---------- NEW: servo & LED helpers ----------
     # def move_servo_direction(self, direction: str, step: int = 10):
@@ -0,0 +1,174 @@
+# clip_recorder.py — Pre/post-event H.264 clips from an in-memory ring buffer
+import os
+import threading
+import time
+
+try:
+    from picamera2.encoders import H264Encoder
+    from picamera2.outputs import CircularOutput
+    HARDWARE = True
+except Exception:
+    HARDWARE = False
+
+CLIP_EXTENSIONS = (".h264", ".mp4")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class ClipRecorder:
+    def __init__(self, camera, out_dir, pre_seconds=5, post_seconds=5, fps=30,
+                 bitrate=2_000_000, quota_bytes=500 * 1024 * 1024):
+        """
+        Continuously encode H.264 into a circular buffer holding the last
+        `pre_seconds` of video. trigger() flushes that buffer to a file and
+        keeps appending for `post_seconds`, all without blocking the caller.
+
+        quota_bytes: upper bound on the total size of out_dir; oldest clips
+                     (then oldest images) are removed once a clip is closed.
+        """
+        self.camera = camera
+        self.out_dir = out_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.bitrate = bitrate
+        self.quota_bytes = quota_bytes
+
+        self.encoder = None
+        self.output = None
+        self.running = False
+        self.current_path = None
+        self._deadline = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    # --- lifecycle ---
+    def start(self):
+        if not HARDWARE:
+            print("[CLIP] picamera2 not available, clip recording disabled.")
+            return
+        if self.running:
+            return
+        cam = self.camera.camera
+        try:
+            if cam.started:
+                cam.stop()
+            cam.configure(self.camera.stream_config)
+            self.encoder = H264Encoder(bitrate=self.bitrate, repeat=True, iperiod=self.fps)
+            self.output = CircularOutput(buffersize=int(self.pre_seconds * self.fps))
+            cam.start_recording(self.encoder, self.output)
+            # Let Camera.close() stop the encoder and keep start_stream() from reconfiguring
+            self.camera.streaming = True
+            self.running = True
+            print(f"[CLIP] Ring buffer recording started ({self.pre_seconds}s pre / {self.post_seconds}s post)")
+        except Exception as e:
+            print("[CLIP] Could not start ring buffer:", e)
+
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._finish_clip()
+        if self.running:
+            try:
+                self.camera.stop_stream()
+            except Exception as e:
+                print("[CLIP] Error stopping recording:", e)
+            self.running = False
+
+    # --- public interface ---
+    def trigger(self, path: str) -> bool:
+        """
+        Start writing a clip to `path`: the buffered pre-event video plus
+        `post_seconds` after now. If a clip is already open its post window
+        is extended instead, so bursts of events produce one file.
+        Returns True if a new clip was started.
+        """
+        if not self.running:
+            return False
+        with self._lock:
+            self._deadline = time.time() + self.post_seconds
+            if self.current_path is not None:
+                return False
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self.output.fileoutput = path
+                self.output.start()
+            except Exception as e:
+                print("[CLIP] Could not open clip:", e)
+                return False
+            self.current_path = path
+            self._schedule(self.post_seconds)
+        print(f"[CLIP] Recording event clip: {path}")
+        return True
+
+    def is_recording_clip(self) -> bool:
+        return self.current_path is not None
+
+    # --- internal helpers ---
+    def _schedule(self, delay):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            remaining = self._deadline - time.time()
+            if remaining > 0.05:
+                self._schedule(remaining)
+                return
+            self._timer = None
+        self._finish_clip()
+
+    def _finish_clip(self):
+        with self._lock:
+            path = self.current_path
+            if path is None:
+                return
+            try:
+                self.output.stop()
+            except Exception as e:
+                print("[CLIP] Error closing clip:", e)
+            self.current_path = None
+        print(f"[CLIP] Saved event clip: {path}")
+        # Quota pass runs off the control thread (we are on the timer thread here)
+        try:
+            self.enforce_quota(keep=path)
+        except Exception as e:
+            print("[CLIP] Quota enforcement error:", e)
+
+    def enforce_quota(self, keep=None):
+        """Delete oldest clips, then oldest images, until out_dir fits in quota_bytes."""
+        if not self.quota_bytes or not os.path.isdir(self.out_dir):
+            return
+        clips, images = [], []
+        total = 0
+        for entry in os.scandir(self.out_dir):
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            total += st.st_size
+            name = entry.name.lower()
+            if entry.path == keep or name.endswith(".part"):
+                continue
+            if name.endswith(CLIP_EXTENSIONS):
+                clips.append((st.st_mtime, st.st_size, entry.path))
+            elif name.endswith(IMAGE_EXTENSIONS):
+                images.append((st.st_mtime, st.st_size, entry.path))
+        if total <= self.quota_bytes:
+            return
+
+        removed = 0
+        for _, size, path in sorted(clips) + sorted(images):
+            if total <= self.quota_bytes:
+                break
+            try:
+                os.remove(path)
+                thumb = os.path.join(self.out_dir, "thumbs", os.path.basename(path))
+                if os.path.exists(thumb):
+                    os.remove(thumb)
+                total -= size
+                removed += 1
+            except OSError as e:
+                print("[CLIP] Could not remove", path, e)
+        print(f"[CLIP] Quota: removed {removed} file(s), {total / (1024 * 1024):.1f} MB in use")
@@ -0,0 +1,275 @@
+# cloud_schema.py — Versioned migrations for the cloud (Postgres) telemetry schema
+#
+# Single source of truth for the `telemetry` table used by CloudSync (writer)
+# and the Flask frontend (reader). Works with any DB-API driver using the
+# %s paramstyle (psycopg2 on the car, psycopg 3 in frontend/database).
+#
+#   telemetry                  partitioned by month on ts (+ DEFAULT partition)
+#   telemetry_rollup_minute    per-minute count/sum/min/max, upserted by sync
+#   telemetry_rollup_hour      per-hour   count/sum/min/max, upserted by sync
+#
+# Rollup averages are <x>_sum / <x>_n: n counts rows, <x>_n the non-NULL
+# values of that column (the sonar reports NULL when it times out).
+#
+# Every table carries car_id so several cars can share one database.
+from datetime import date, datetime, timezone
+
+ROLLUP_TABLES = {"minute": "telemetry_rollup_minute", "hour": "telemetry_rollup_hour"}
+ROLLUP_SERIES = ("ir", "distance", "battery", "speed")
+PARTITION_MONTHS_AHEAD = 2
+# car_id given to rows written before fleet support
+LEGACY_CAR_ID = "car1"
+
+TELEMETRY_COLUMNS = """
+    id BIGSERIAL,
+    ts TIMESTAMP WITH TIME ZONE NOT NULL,
+    mode TEXT,
+    ir INTEGER,
+    distance REAL,
+    battery REAL,
+    motor JSONB,
+    PRIMARY KEY (id, ts)
+"""
+
+ROLLUP_COLUMNS = """
+    bucket TIMESTAMP WITH TIME ZONE PRIMARY KEY,
+    n INTEGER NOT NULL,
+    ir_sum DOUBLE PRECISION, ir_min INTEGER, ir_max INTEGER,
+    distance_sum DOUBLE PRECISION, distance_min REAL, distance_max REAL,
+    battery_sum DOUBLE PRECISION, battery_min REAL, battery_max REAL,
+    speed_sum DOUBLE PRECISION, speed_min REAL, speed_max REAL
+"""
+
+
+# -------------------------
+# PARTITIONS
+# -------------------------
+def _month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"telemetry_y{month.year:04d}m{month.month:02d}"
+
+
+def ensure_partition(cur, month):
+    """Create the monthly partition holding `month` (a date) if it does not exist."""
+    start = _month_start(month)
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF telemetry "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_next_month(start).isoformat()}')"
+    )
+
+
+def ensure_partitions(cur, first=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create partitions from `first` (default: this month) through months_ahead months."""
+    month = _month_start(first or datetime.now(timezone.utc).date())
+    for _ in range(months_ahead + 1):
+        ensure_partition(cur, month)
+        month = _next_month(month)
+
+
+# -------------------------
+# MIGRATIONS
+# -------------------------
+def _table_kind(cur, name):
+    """'r' plain table, 'p' partitioned table, None if missing."""
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relnamespace = 'public'::regnamespace", (name,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    kind = row[0]
+    return kind.decode() if isinstance(kind, bytes) else kind
+
+
+def _columns(cur, name):
+    cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (name,))
+    return {r[0] for r in cur.fetchall()}
+
+
+def _m001_partitioned_telemetry(cur):
+    kind = _table_kind(cur, "telemetry")
+    legacy = None
+    if kind == "r":
+        # Pre-partitioning table: move it aside and copy rows if the layout matches
+        cur.execute("ALTER TABLE telemetry RENAME TO telemetry_legacy")
+        cur.execute("ALTER INDEX IF EXISTS telemetry_pkey RENAME TO telemetry_legacy_pkey")
+        legacy = _columns(cur, "telemetry_legacy")
+    if kind != "p":
+        cur.execute(f"CREATE TABLE telemetry ({TELEMETRY_COLUMNS}) PARTITION BY RANGE (ts)")
+        cur.execute("CREATE TABLE IF NOT EXISTS telemetry_default PARTITION OF telemetry DEFAULT")
+
+    first = None
+    if legacy and {"ts", "mode", "ir", "distance", "battery", "motor"} <= legacy:
+        cur.execute("SELECT min(ts) FROM telemetry_legacy WHERE ts IS NOT NULL")
+        oldest = cur.fetchone()[0]
+        if oldest is not None:
+            first = oldest.date()
+    ensure_partitions(cur)
+    if first is not None:
+        # Cover every month between the oldest legacy row and now
+        month = _month_start(first)
+        while month <= _month_start(datetime.now(timezone.utc).date()):
+            ensure_partition(cur, month)
+            month = _next_month(month)
+        cur.execute("""
+            INSERT INTO telemetry (ts, mode, ir, distance, battery, motor)
+            SELECT ts, mode, ir, distance, battery, motor::jsonb
+            FROM telemetry_legacy WHERE ts IS NOT NULL
+        """)
+        print(f"[SCHEMA] Copied {cur.rowcount} rows from telemetry_legacy")
+    elif legacy:
+        print("[SCHEMA] Kept old telemetry table as telemetry_legacy (different layout, not copied)")
+
+
+def _m002_timestamp_indexes(cur):
+    # BRIN: tiny, ideal for append-mostly time ranges; B-tree: exact ordering/short ranges
+    cur.execute("CREATE INDEX IF NOT EXISTS telemetry_ts_brin ON telemetry USING BRIN (ts)")
+    cur.execute("CREATE INDEX IF NOT EXISTS telemetry_ts_btree ON telemetry (ts)")
+
+
+def _m003_rollup_tables(cur):
+    for table in ROLLUP_TABLES.values():
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({ROLLUP_COLUMNS})")
+    # Backfill from raw rows already in the cloud
+    for unit, table in ROLLUP_TABLES.items():
+        cur.execute(f"""
+            INSERT INTO {table}
+            SELECT date_trunc('{unit}', ts), count(*),
+                   sum(ir), min(ir), max(ir),
+                   sum(distance), min(distance), max(distance),
+                   sum(battery), min(battery), max(battery),
+                   sum(s), min(s), max(s)
+            FROM (
+                SELECT ts, ir, distance, battery,
+                       CASE WHEN jsonb_typeof(motor) = 'array' THEN (motor->>0)::real END AS s
+                FROM telemetry
+            ) t
+            GROUP BY 1
+            ON CONFLICT (bucket) DO NOTHING
+        """)
+
+
+def _m004_car_id(cur):
+    cur.execute("ALTER TABLE telemetry ADD COLUMN IF NOT EXISTS car_id TEXT")
+    cur.execute("UPDATE telemetry SET car_id = %s WHERE car_id IS NULL", (LEGACY_CAR_ID,))
+    cur.execute("CREATE INDEX IF NOT EXISTS telemetry_car_ts ON telemetry (car_id, ts)")
+    for table in ROLLUP_TABLES.values():
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS car_id TEXT NOT NULL DEFAULT '{LEGACY_CAR_ID}'")
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN car_id DROP DEFAULT")
+        cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey")
+        cur.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (car_id, bucket)")
+
+
+def _m005_rollup_value_counts(cur):
+    for unit, table in ROLLUP_TABLES.items():
+        for series in ROLLUP_SERIES:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {series}_n INTEGER NOT NULL DEFAULT 0")
+        # Backfill from the raw rows
+        cur.execute(f"""
+            UPDATE {table} r
+            SET ir_n = t.ir_n, distance_n = t.distance_n, battery_n = t.battery_n, speed_n = t.speed_n
+            FROM (
+                SELECT car_id, date_trunc('{unit}', ts) AS bucket,
+                       count(ir) AS ir_n, count(distance) AS distance_n, count(battery) AS battery_n,
+                       count(CASE WHEN jsonb_typeof(motor) = 'array' THEN motor->>0 END) AS speed_n
+                FROM telemetry
+                GROUP BY 1, 2
+            ) t
+            WHERE r.car_id = t.car_id AND r.bucket = t.bucket
+        """)
+
+
+MIGRATIONS = [
+    (1, "partitioned telemetry table", _m001_partitioned_telemetry),
+    (2, "timestamp indexes", _m002_timestamp_indexes),
+    (3, "minute/hour rollup tables", _m003_rollup_tables),
+    (4, "car_id on telemetry and rollups", _m004_car_id),
+    (5, "per-column value counts on rollups", _m005_rollup_value_counts),
+]
+
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction. Returns the schema version."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )""")
+        cur.execute("SELECT coalesce(max(version), 0) FROM schema_migrations")
+        current = cur.fetchone()[0]
+    conn.commit()
+
+    for version, name, step in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            with conn.cursor() as cur:
+                step(cur)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            current = version
+            print(f"[SCHEMA] Applied migration {version}: {name}")
+        except Exception:
+            conn.rollback()
+            raise
+
+    # Keep partitions ahead of the clock on every start
+    with conn.cursor() as cur:
+        ensure_partitions(cur)
+    conn.commit()
+    return current
+
+
+# -------------------------
+# ROLLUPS (called by the sync path for each inserted batch)
+# -------------------------
+def update_rollups(cur, rows):
+    """
+    Merge a batch of raw rows into the minute/hour rollups.
+    rows: iterable of (car_id, ts, ir, distance, battery, speed) with ts as ISO string or datetime.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    cols = list(zip(*rows))
+    for unit, table in ROLLUP_TABLES.items():
+        cur.execute(f"""
+            INSERT INTO {table} AS r
+                (bucket, n, ir_sum, ir_min, ir_max, distance_sum, distance_min, distance_max,
+                 battery_sum, battery_min, battery_max, speed_sum, speed_min, speed_max, car_id,
+                 ir_n, distance_n, battery_n, speed_n)
+            SELECT date_trunc('{unit}', b.ts), count(*),
+                   sum(b.ir), min(b.ir), max(b.ir),
+                   sum(b.distance), min(b.distance), max(b.distance),
+                   sum(b.battery), min(b.battery), max(b.battery),
+                   sum(b.speed), min(b.speed), max(b.speed), b.car_id,
+                   count(b.ir), count(b.distance), count(b.battery), count(b.speed)
+            FROM unnest(%s::text[], %s::timestamptz[], %s::integer[], %s::real[], %s::real[], %s::real[])
+                 AS b(car_id, ts, ir, distance, battery, speed)
+            GROUP BY b.car_id, 1
+            ON CONFLICT (car_id, bucket) DO UPDATE SET
+                n = r.n + EXCLUDED.n,
+                ir_sum = coalesce(r.ir_sum, 0) + coalesce(EXCLUDED.ir_sum, 0),
+                ir_min = least(r.ir_min, EXCLUDED.ir_min),
+                ir_max = greatest(r.ir_max, EXCLUDED.ir_max),
+                distance_sum = coalesce(r.distance_sum, 0) + coalesce(EXCLUDED.distance_sum, 0),
+                distance_min = least(r.distance_min, EXCLUDED.distance_min),
+                distance_max = greatest(r.distance_max, EXCLUDED.distance_max),
+                battery_sum = coalesce(r.battery_sum, 0) + coalesce(EXCLUDED.battery_sum, 0),
+                battery_min = least(r.battery_min, EXCLUDED.battery_min),
+                battery_max = greatest(r.battery_max, EXCLUDED.battery_max),
+                speed_sum = coalesce(r.speed_sum, 0) + coalesce(EXCLUDED.speed_sum, 0),
+                speed_min = least(r.speed_min, EXCLUDED.speed_min),
+                speed_max = greatest(r.speed_max, EXCLUDED.speed_max),
+                ir_n = r.ir_n + EXCLUDED.ir_n,
+                distance_n = r.distance_n + EXCLUDED.distance_n,
+                battery_n = r.battery_n + EXCLUDED.battery_n,
+                speed_n = r.speed_n + EXCLUDED.speed_n
+        """, [list(c) for c in cols])
@@ -0,0 +1,262 @@
+# control_server.py — Direct low-latency control channel (UDP, authenticated)
+#
+# Browser -> Flask -> Adafruit IO -> MQTT adds hundreds of milliseconds and is
+# rate limited, which is fine for mode switches but not for driving. A
+# joystick client on the same network can instead send commands straight to
+# the car over UDP. Adafruit IO stays the fallback: ControlClient.send()
+# returns False when the car does not acknowledge, and the caller can then
+# publish the same command to the feed.
+#
+# Datagram layout (big endian):
+#   b"SC" | version:u8 | session:u64 | seq:u32 | JSON payload | HMAC-SHA256[:16]
+# The tag covers everything before it. Acks are the 15-byte header with magic
+# b"SA". A client picks a new session (its wall-clock time in ms) on every
+# start; sessions older than the current one are rejected, and within a
+# session any seq not above the last accepted one is dropped (late or
+# replayed). Sessions must also have started after the server did (within
+# SESSION_SKEW_MS of clock skew), so packets captured before a restart of
+# the car cannot be replayed to it. A client whose session predates the
+# restart stops getting acks and opens a new session.
+import hmac
+import json
+import socket
+import struct
+import hashlib
+import threading
+import time
+
+MAGIC = b"SC"
+ACK_MAGIC = b"SA"
+VERSION = 1
+HEADER = struct.Struct(">2sBQI")
+TAG_SIZE = 16
+MAX_PACKET = 512
+# Tolerated clock difference between client and car (ms)
+SESSION_SKEW_MS = 2000
+
+# Commands that end motion; they never arm the dead-man timer
+STOP_COMMANDS = ("stop", "manual_stop")
+
+
+def _tag(key, data):
+    return hmac.new(key, data, hashlib.sha256).digest()[:TAG_SIZE]
+
+
+def encode_packet(key, session, seq, payload):
+    body = HEADER.pack(MAGIC, VERSION, session, seq) + json.dumps(payload, separators=(",", ":")).encode()
+    return body + _tag(key, body)
+
+
+def decode_packet(key, data):
+    """Return (session, seq, payload) or raise ValueError."""
+    if len(data) < HEADER.size + TAG_SIZE:
+        raise ValueError("short packet")
+    body, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+    if not hmac.compare_digest(tag, _tag(key, body)):
+        raise PermissionError("bad tag")
+    magic, version, session, seq = HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("bad header")
+    payload = json.loads(body[HEADER.size:] or b"{}")
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be an object")
+    return session, seq, payload
+
+
+class ControlServer:
+    def __init__(self, key, on_command, on_deadman, port=5005, host="0.0.0.0", deadman_timeout=0.5):
+        """
+        UDP control server.
+
+        on_command(topic, payload) gets every accepted command with topic
+        "direct" — the same signature as MQTTClient.on_command, so one
+        handler serves both paths. Packets with an empty payload are
+        keepalives. After any non-stop command, on_deadman() is called once
+        if no valid packet arrives within deadman_timeout seconds; clients
+        are expected to repeat the current command (ControlClient.hold()).
+        """
+        if not key:
+            raise ValueError("ControlServer needs a shared key")
+        self.key = key.encode() if isinstance(key, str) else key
+        self.on_command = on_command
+        self.on_deadman = on_deadman
+        self.host = host
+        self.port = port
+        self.deadman_timeout = deadman_timeout
+        self.sock = None
+        self._thread = None
+        self._running = False
+        self._session = 0
+        self._last_seq = -1
+        # Oldest session accepted; set on start()
+        self._epoch = None
+        self._last_valid = 0.0
+        self._armed = False
+        self.stats = {"received": 0, "accepted": 0, "keepalive": 0, "bad_auth": 0,
+                      "malformed": 0, "stale": 0, "deadman_stops": 0}
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self._epoch = int(time.time() * 1000) - SESSION_SKEW_MS
+        # Wake up often enough to enforce the dead-man timeout
+        self.sock.settimeout(min(0.05, self.deadman_timeout / 4))
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="control-server", daemon=True)
+        self._thread.start()
+        print(f"[CONTROL] Direct control listening on udp://{self.host}:{self.port}")
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+        if self.sock:
+            self.sock.close()
+
+    def active(self, within=1.0):
+        """True if a valid packet arrived in the last `within` seconds."""
+        return self._last_valid and time.monotonic() - self._last_valid < within
+
+    def _loop(self):
+        while self._running:
+            try:
+                data, addr = self.sock.recvfrom(MAX_PACKET)
+            except socket.timeout:
+                data = None
+            except OSError:
+                break
+            if data is not None:
+                self._handle(data, addr)
+            if self._armed and time.monotonic() - self._last_valid > self.deadman_timeout:
+                self._armed = False
+                self.stats["deadman_stops"] += 1
+                print(f"[CONTROL] Dead-man timeout ({self.deadman_timeout}s without commands) — stopping")
+                try:
+                    self.on_deadman()
+                except Exception as e:
+                    print("[CONTROL] Dead-man handler error:", e)
+
+    def _handle(self, data, addr):
+        self.stats["received"] += 1
+        try:
+            session, seq, payload = decode_packet(self.key, data)
+        except PermissionError:
+            self.stats["bad_auth"] += 1
+            return
+        except ValueError:
+            self.stats["malformed"] += 1
+            return
+
+        if session != self._session and not (
+                self._epoch <= session <= int(time.time() * 1000) + SESSION_SKEW_MS):
+            # Started before this server (captured traffic) or implausibly far ahead
+            self.stats["stale"] += 1
+            return
+        if session < self._session or (session == self._session and seq <= self._last_seq):
+            self.stats["stale"] += 1
+            return
+        if session != self._session:
+            print(f"[CONTROL] New control session {session} from {addr[0]}")
+        self._session, self._last_seq = session, seq
+        self._last_valid = time.monotonic()
+        try:
+            self.sock.sendto(HEADER.pack(ACK_MAGIC, VERSION, session, seq), addr)
+        except OSError:
+            pass
+
+        if not payload:
+            self.stats["keepalive"] += 1
+            return
+        self.stats["accepted"] += 1
+        cmd = str(payload.get("command") or payload.get("value") or "").strip().lower()
+        self._armed = cmd not in STOP_COMMANDS
+        try:
+            self.on_command("direct", payload)
+        except Exception as e:
+            print("[CONTROL] Command handler error:", e)
+
+
+class ControlClient:
+    def __init__(self, host, key, port=5005, ack_timeout=0.1, renew_after=3):
+        """
+        Client side of the direct channel (joystick apps, the web frontend on the LAN).
+        send() returns True once the car acknowledged the packet. After
+        renew_after unacknowledged packets in a row the client opens a new
+        session, which is how it reconnects after the car restarted.
+        """
+        self.addr = (host, port)
+        self.key = key.encode() if isinstance(key, str) else key
+        self.ack_timeout = ack_timeout
+        self.renew_after = renew_after
+        self.session = int(time.time() * 1000)
+        self._seq = 0
+        self._missed = 0
+        self._lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(ack_timeout)
+        self._hold = None
+        self._hold_thread = None
+
+    def send(self, payload, wait_ack=True):
+        with self._lock:
+            if self._missed >= self.renew_after:
+                self.session = max(int(time.time() * 1000), self.session + 1)
+                self._seq = 0
+                self._missed = 0
+            self._seq += 1
+            seq = self._seq
+            try:
+                self.sock.sendto(encode_packet(self.key, self.session, seq, payload), self.addr)
+                if not wait_ack:
+                    return True
+                deadline = time.monotonic() + self.ack_timeout
+                while time.monotonic() < deadline:
+                    ack = self.sock.recv(64)
+                    magic, _, session, acked = HEADER.unpack_from(ack)
+                    if magic == ACK_MAGIC and session == self.session and acked >= seq:
+                        self._missed = 0
+                        return True
+            except (OSError, struct.error):
+                pass
+            self._missed += 1
+            return False
+
+    def hold(self, payload, rate_hz=20):
+        """
+        Keep re-sending `payload` at rate_hz (feeds the dead-man timer) until
+        hold(None). Acks are awaited so a lost session gets renewed.
+        """
+        self._hold = payload
+        if payload is None or self._hold_thread is not None:
+            return
+
+        def run():
+            while self._hold is not None:
+                t0 = time.monotonic()
+                self.send(self._hold)
+                time.sleep(max(0.0, 1.0 / rate_hz - (time.monotonic() - t0)))
+            self._hold_thread = None
+
+        self._hold_thread = threading.Thread(target=run, name="control-hold", daemon=True)
+        self._hold_thread.start()
+
+    def close(self):
+        self._hold = None
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    # Drive test: python control_server.py <car-ip> <key> forward 2
+    import sys
+    host, key, command = sys.argv[1], sys.argv[2], sys.argv[3]
+    seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+    client = ControlClient(host, key)
+    t0 = time.perf_counter()
+    ok = client.send({"command": command})
+    print(f"{command}: {'acked' if ok else 'no ack'} in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    client.hold({"command": command})
+    time.sleep(seconds)
+    client.hold(None)
+    client.send({"command": "stop"})
+    client.close()
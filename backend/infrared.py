@@ -1,5 +1,6 @@
 # Infrared (line) sensors with simulation fallback
 import time, random
+from metrics import timed
 try:
     from gpiozero import LineSensor
     HARDWARE = True
@@ -21,6 +22,7 @@ class Infrared:
         else:
             return 1 if self.sensors[channel].value else 0
 
+    @timed("infrared.read_all")
     def read_all_infrared(self) -> int:
         return (self.read_one_infrared(1) << 2) | (self.read_one_infrared(2) << 1) | self.read_one_infrared(3)
 
@@ -0,0 +1,92 @@
+# kinematics.py — Map continuous drive vectors to wheel duties
+#
+# Wheel order everywhere is the Ordinary_Car.set_motor_model order:
+#   (left_upper, left_lower, right_upper, right_lower) = (FL, BL, FR, BR)
+#
+# Inputs are normalised to [-1, 1]; outputs are integer duties scaled to
+# max_duty. When a combination would push any wheel past full scale, all
+# wheels are scaled down together so the direction of travel is preserved.
+
+# Manual driving tops out well below the 4095 hardware limit
+DEFAULT_MAX_DUTY = 1500
+# Joystick noise around the centre is ignored
+DEFAULT_DEADZONE = 0.05
+
+
+def clamp(value, low=-1.0, high=1.0):
+    return low if value < low else high if value > high else value
+
+
+def _deadzone(value, deadzone):
+    value = clamp(float(value))
+    return 0.0 if abs(value) < deadzone else value
+
+
+def normalize(wheels):
+    """Scale all wheels down together if any exceeds 1."""
+    peak = max(abs(w) for w in wheels)
+    if peak <= 1.0:
+        return tuple(wheels)
+    return tuple(w / peak for w in wheels)
+
+
+def to_duties(wheels, max_duty=DEFAULT_MAX_DUTY):
+    return tuple(int(round(w * max_duty)) for w in normalize(wheels))
+
+
+def differential(throttle, steering, max_duty=DEFAULT_MAX_DUTY, deadzone=DEFAULT_DEADZONE):
+    """
+    Tank-style mixing.
+    throttle: +1 full forward, -1 full reverse
+    steering: +1 turn right, -1 turn left
+    """
+    t = _deadzone(throttle, deadzone)
+    s = _deadzone(steering, deadzone)
+    left, right = t + s, t - s
+    return to_duties((left, left, right, right), max_duty)
+
+
+def mecanum(vx, vy, omega, max_duty=DEFAULT_MAX_DUTY, deadzone=DEFAULT_DEADZONE):
+    """
+    Holonomic mixing for mecanum wheels (same wheel equations as Car.mode_rotate).
+    vx: +1 strafe right, vy: +1 forward, omega: +1 rotate counter-clockwise
+    """
+    vx = _deadzone(vx, deadzone)
+    vy = _deadzone(vy, deadzone)
+    w = _deadzone(omega, deadzone)
+    fl = vy + vx - w
+    bl = vy - vx - w
+    fr = vy - vx + w
+    br = vy + vx + w
+    return to_duties((fl, bl, fr, br), max_duty)
+
+
+def parse_drive(payload):
+    """
+    Wheel duties for a drive command, or None if payload is not one.
+
+    Accepted forms (all values in [-1, 1]):
+      {"drive": [throttle, steering]}            compact differential
+      {"drive": [vx, vy, omega]}                 compact mecanum
+      {"command": "drive", "throttle": t, "steering": s}
+      {"command": "drive", "vx": x, "vy": y, "omega": w}
+    An optional "max_duty" caps the output (never above 4095).
+    """
+    if not isinstance(payload, dict):
+        return None
+    max_duty = min(int(payload.get("max_duty", DEFAULT_MAX_DUTY)), 4095)
+    vector = payload.get("drive")
+    if isinstance(vector, dict):
+        payload, vector = vector, None
+    elif vector is None and str(payload.get("command") or payload.get("value") or "").lower() != "drive":
+        return None
+
+    if isinstance(vector, (list, tuple)):
+        if len(vector) == 2:
+            return differential(vector[0], vector[1], max_duty)
+        if len(vector) == 3:
+            return mecanum(vector[0], vector[1], vector[2], max_duty)
+        raise ValueError(f"drive vector needs 2 or 3 values, got {len(vector)}")
+    if any(k in payload for k in ("vx", "vy", "omega")):
+        return mecanum(payload.get("vx", 0), payload.get("vy", 0), payload.get("omega", 0), max_duty)
+    return differential(payload.get("throttle", 0), payload.get("steering", 0), max_duty)
@@ -1,6 +1,9 @@
 
 import time
 import traceback
+from log import get_logger
+
+_sim_log = get_logger("led sim")
 
 # Try to import the project's hardware driver modules (they exist in your repo)
 try:
@@ -70,7 +73,7 @@ class Led:
         if not getattr(self, "is_support_led_function", False) or not self.strip:
             # simulate: just remember the color
             self._last_color = (r, g, b)
-            print(f"[LED SIM] set_all_led_color -> ({r},{g},{b})")
+            _sim_log.debug("set_all_led_color", r=r, g=g, b=b)
             return
 
         try:
@@ -99,7 +102,7 @@ class Led:
     def blink(self, r: int, g: int, b: int, interval: float = 0.3, times: int = 3):
         """Blink LEDs as feedback."""
         if not getattr(self, "is_support_led_function", False):
-            print("[LED SIM] blink -> ({},{},{}) x{}".format(r, g, b, times))
+            _sim_log.debug("blink", r=r, g=g, b=b, times=times)
             return
         for _ in range(times):
             self.set_all_led_color(r, g, b)
@@ -119,7 +122,7 @@ class Led:
             - If index is other, treat as 'all'
         """
         if not self.strip and self.simulate:
-            print(f"[LED SIM] set_led({index}, {on})")
+            _sim_log.debug("set_led", index=index, on=on)
             return
 
         try:
@@ -3,11 +3,13 @@ import sqlite3
 import threading
 import time
 from datetime import datetime
+from metrics import timed
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS telemetry (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     ts TEXT NOT NULL,
+    car_id TEXT,
     mode TEXT,
     ir INTEGER,
     distance REAL,
@@ -32,16 +34,21 @@ class LocalDB:
     def _init_db(self):
         with self._conn() as conn:
             conn.executescript(SCHEMA)
+            # Databases created before fleet support lack car_id
+            cols = {row["name"] for row in conn.execute("PRAGMA table_info(telemetry)")}
+            if "car_id" not in cols:
+                conn.execute("ALTER TABLE telemetry ADD COLUMN car_id TEXT")
 
+    @timed("localdb.insert_telemetry")
     def insert_telemetry(self, data):
         """
-        data: dict with keys ts, mode, ir, distance, battery, motor
+        data: dict with keys ts, car_id, mode, ir, distance, battery, motor
         """
         with self._lock:
             with self._conn() as conn:
                 conn.execute(
-                    "INSERT INTO telemetry (ts, mode, ir, distance, battery, motor, synced) VALUES (?, ?, ?, ?, ?, ?, 0)",
-                    (data.get("ts"), data.get("mode"), data.get("ir"), data.get("distance"), data.get("battery"), str(data.get("motor")))
+                    "INSERT INTO telemetry (ts, car_id, mode, ir, distance, battery, motor, synced) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                    (data.get("ts"), data.get("car_id"), data.get("mode"), data.get("ir"), data.get("distance"), data.get("battery"), str(data.get("motor")))
                 )
                 conn.commit()
 
@@ -0,0 +1,241 @@
+# log.py — Structured, level-gated logging with an off-thread writer
+#
+#   from log import get_logger
+#   _log = get_logger("sensors")
+#   _log.info("reading", ir=5, distance=42.0)        ->  [SENSORS] reading ir=5 distance=42.0
+#
+#   # Hot loop: at most one line per second, with a count of what was skipped
+#   _sensor_log = _log.throttle(interval=1.0)
+#   _sensor_log.info("reading", ir=bits)
+#
+# The level check runs first and is a single integer comparison, so a
+# disabled call costs one method call: no message is built, no fields are
+# formatted, nothing is queued. Enabled records go onto a bounded queue and
+# a listener thread formats and writes them, so the control loop never
+# waits on stdout, SSH or journald. Records that do not fit in the queue are
+# dropped and counted instead of blocking.
+#
+# Until setup() is called (e.g. a module imported from a script) warnings
+# and errors still reach stderr through the logging module's fallback.
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+ROOT = "smartcar"
+DEFAULT_LEVEL = os.getenv("SMARTCAR_LOG_LEVEL", "INFO").upper()
+QUEUE_SIZE = 10000
+# How long stop() waits for the writer to make room for its end marker
+SHUTDOWN_WAIT = 1.0
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+_listener = None
+_handler = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener thread."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock prepare() formats the message on the caller's thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener whose stop() cannot fail with queue.Full on a full queue."""
+
+    def __init__(self, handler, *handlers):
+        super().__init__(handler.queue, *handlers, respect_handler_level=False)
+        self.handler = handler
+
+    def enqueue_sentinel(self):
+        # The stock version uses put_nowait(); wait for the writer instead,
+        # and if it is not draining, drop the oldest records to make room
+        while True:
+            try:
+                self.queue.put(self._sentinel, timeout=SHUTDOWN_WAIT)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.handler.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class TextFormatter(logging.Formatter):
+    """The existing console style: '[TAG] message key=value ...'."""
+
+    def format(self, record):
+        line = f"[{record.name.rsplit('.', 1)[-1].upper()}] {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for journald/log shippers."""
+
+    def format(self, record):
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            out.update(fields)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class StructLogger:
+    """Thin wrapper over a logging.Logger taking key=value fields."""
+
+    __slots__ = ("logger",)
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def enabled(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, msg, *args, exc_info=None, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger._log(level, msg, args, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, msg, *args, **fields):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger._log(logging.DEBUG, msg, args, extra={"fields": fields})
+
+    def info(self, msg, *args, **fields):
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger._log(logging.INFO, msg, args, extra={"fields": fields})
+
+    def warning(self, msg, *args, **fields):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger._log(logging.WARNING, msg, args, extra={"fields": fields})
+
+    def error(self, msg, *args, exc_info=None, **fields):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger._log(logging.ERROR, msg, args, exc_info=exc_info, extra={"fields": fields})
+
+    def throttle(self, interval=None, every=None):
+        """
+        Log site for hot loops: emits at most once per `interval` seconds
+        and/or only every `every`-th call; the rest are counted and reported
+        as suppressed=N on the next line that gets through.
+        """
+        return Throttled(self.logger, interval, every)
+
+
+class Throttled(StructLogger):
+    __slots__ = ("interval", "every", "_calls", "_next", "_suppressed", "_lock")
+
+    def __init__(self, logger, interval=None, every=None):
+        super().__init__(logger)
+        self.interval = interval
+        self.every = every
+        self._calls = 0
+        self._next = 0.0
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        """Suppressed count since the last emitted line, or None to skip this one."""
+        with self._lock:
+            self._calls += 1
+            if self.every and self._calls % self.every:
+                self._suppressed += 1
+                return None
+            if self.interval:
+                now = time.monotonic()
+                if now < self._next:
+                    self._suppressed += 1
+                    return None
+                self._next = now + self.interval
+            suppressed, self._suppressed = self._suppressed, 0
+            return suppressed
+
+    def log(self, level, msg, *args, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._admit()
+        if suppressed is None:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger._log(level, msg, args, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, msg, *args, **fields):
+        self.log(logging.DEBUG, msg, *args, **fields)
+
+    def info(self, msg, *args, **fields):
+        self.log(logging.INFO, msg, *args, **fields)
+
+    def warning(self, msg, *args, **fields):
+        self.log(logging.WARNING, msg, *args, **fields)
+
+    def error(self, msg, *args, exc_info=None, **fields):
+        self.log(logging.ERROR, msg, *args, exc_info=exc_info, **fields)
+
+
+def get_logger(name):
+    """StructLogger for `name` under the smartcar hierarchy (tag printed as [NAME])."""
+    return StructLogger(logging.getLogger(f"{ROOT}.{name}"))
+
+
+def setup(level=None, fmt="text", stream=None, queue_size=QUEUE_SIZE):
+    """
+    Route smartcar.* loggers through a bounded queue to a writer thread.
+    level: name or number (default SMARTCAR_LOG_LEVEL, else INFO)
+    fmt: "text" ([TAG] lines like the rest of the console output) or "json"
+    """
+    global _listener, _handler
+    shutdown()
+    root = logging.getLogger(ROOT)
+    level = level or DEFAULT_LEVEL
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.propagate = False
+
+    out = logging.StreamHandler(stream or sys.stdout)
+    out.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    _handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    root.handlers[:] = [_handler]
+    _listener = _Listener(_handler, out)
+    _listener.start()
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def stats():
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT).getEffectiveLevel()),
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
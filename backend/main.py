@@ -4,7 +4,6 @@ import time
 import json
 import os
 import signal
-import threading
 from datetime import datetime
 
 from config import (
@@ -20,6 +19,19 @@ from config import (
     CAPTURE_DIR
 )
 
+try:
+    from config import CAR_ID
+except ImportError:
+    # config.py files from before fleet support
+    CAR_ID = os.getenv("CAR_ID", "car1")
+
+try:
+    from config import CONTROL_PORT, CONTROL_KEY
+except ImportError:
+    # Direct control is off unless a shared key is configured
+    CONTROL_PORT = int(os.getenv("CONTROL_PORT", 5005))
+    CONTROL_KEY = os.getenv("CONTROL_KEY")
+
 from logger import log_jsonl
 from mqtt_client import MQTTClient
 from car import Car
@@ -27,12 +39,55 @@ from camera import Camera
 from buzzer import Buzzer
 from localdb import LocalDB
 from sync_to_cloud import CloudSync
+from capture_pipeline import CapturePipeline, DROP_OLDEST
+from clip_recorder import ClipRecorder
+from vision import VisionStage
+from control_server import ControlServer
+from kinematics import parse_drive
+from watchdog import SafetyWatchdog
+from telemetry import collect_telemetry
+from profiler import SamplingProfiler
+from metrics import REGISTRY as metrics
+import log
+import maneuvers
+
+# Sensor readout runs every tick; print at most once a second
+_sensor_log = log.get_logger("sensors").throttle(interval=1.0)
 
 # Global flags
 running = True
 car_active = False
-_capture_lock = threading.Lock()
-_is_capturing = False
+
+# Capture pipeline settings
+IMAGE_FEED = "JDover9000/feeds/smartcar-images"
+CAPTURE_WORKERS = 2
+CAPTURE_QUEUE_SIZE = 8
+CAPTURE_DROP_POLICY = DROP_OLDEST
+
+# Direct control: stop if a driving client goes quiet for this long
+CONTROL_DEADMAN_SECONDS = 0.5
+
+# Safety watchdog: stop the wheels if the main loop stalls, or if the command
+# link is lost while driving manually
+WATCHDOG_RATE_HZ = 100
+WATCHDOG_LOOP_TIMEOUT = 0.5
+WATCHDOG_LINK_TIMEOUT = 3.0
+
+# Metrics: Prometheus text endpoint for scraping on the LAN (0 = off); a
+# compact summary also rides along with every telemetry message.
+# SMARTCAR_METRICS=0 turns instrumentation off entirely.
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+# Profiling: window used by --profile without a value and by the MQTT
+# "profile" command without "seconds"; output goes to LOG_DIR/profiles
+PROFILE_SECONDS = 30
+PROFILE_INTERVAL = 0.01
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+
+# Event clip settings
+CLIP_PRE_SECONDS = 5
+CLIP_POST_SECONDS = 5
+CAPTURE_QUOTA_MB = 500
 
 
 def handle_sigint(signum, frame):
@@ -49,59 +104,14 @@ def create_car(simulate=False):
     return Car(simulate=simulate)
 
 
-def _capture_image_thread(camera: Camera, path: str, mqtt: MQTTClient = None):
-    """
-    Non-blocking capture worker.
-    """
-    global _is_capturing
-    with _capture_lock:
-        if _is_capturing:
-            return
-        _is_capturing = True
-
-    started_here = False
-    try:
-        # Try starting camera if necessary
-        try:
-            if hasattr(camera, "camera"):
-                started_attr = getattr(camera.camera, "started", None)
-                if not started_attr and hasattr(camera.camera, "start"):
-                    try:
-                        camera.camera.start()
-                        started_here = True
-                    except Exception:
-                        pass
-        except Exception:
-            pass
-
-        try:
-            camera.save_image(path)
-            print(f"[CAM] Saved image: {path}")
-
-            # Publish image URL to MQTT for frontend
-            if mqtt is not None:
-                image_url = f"http://<RPI_IP>:5000/images/{os.path.basename(path)}"
-                mqtt.publish("JDover9000/feeds/smartcar-images", json.dumps({"url": image_url}))
-                print(f"[MQTT] Published image URL: {image_url}")
-
-        except Exception as e:
-            print("[CAM] Error saving image:", e)
-
-    finally:
-        if started_here:
-            try:
-                camera.camera.stop()
-            except Exception:
-                pass
-        with _capture_lock:
-            _is_capturing = False
-
-
 def _execute_manual_command(car: Car, buzzer: Buzzer, cmd: str):
     """
     Execute immediate manual command. Defensive: captures exceptions so handler won't crash.
+    Movement commands preempt any running maneuver.
     """
     try:
+        if cmd in ("forward", "backward", "left", "right", "stop", "manual_stop"):
+            car.maneuvers.stop()
         if cmd == "forward":
             print("[MANUAL] Forward")
             car.motor.set_motor_model(800, 800, 800, 800)
@@ -129,7 +139,17 @@ def _execute_manual_command(car: Car, buzzer: Buzzer, cmd: str):
         print(f"[MANUAL] Error executing '{cmd}':", e)
 
 
-def on_command_factory(car, buzzer, camera, mqtt):
+MANEUVERS = {
+    "rotate_left": lambda car: maneuvers.rotate_by(car.motor, 90, time_scale=car.battery.residual()),
+    "rotate_right": lambda car: maneuvers.rotate_by(car.motor, -90, time_scale=car.battery.residual()),
+    "u_turn": lambda car: maneuvers.rotate_by(car.motor, 180, time_scale=car.battery.residual()),
+    "reverse_turn": lambda car: maneuvers.reverse_and_turn(car.motor),
+    "arc_left": lambda car: maneuvers.arc(car.motor, 1.5, turn=0.5),
+    "arc_right": lambda car: maneuvers.arc(car.motor, 1.5, turn=-0.5),
+}
+
+
+def on_command_factory(car, buzzer, capture, profiler=None):
     """
     Command handler that accepts:
     - start / stop
@@ -138,11 +158,35 @@ def on_command_factory(car, buzzer, camera, mqtt):
     - buzzer toggles
     - led controls
     - take_photo / capture
+    - maneuvers: rotate_left, rotate_right, u_turn, reverse_turn, arc_left, arc_right
+    - batches: {"commands": [...]} executed in order
+    - continuous drive vectors: {"drive": [throttle, steering]} or [vx, vy, omega]
+    - profile: {"command": "profile", "seconds": 20} samples every thread
     """
     def _on_cmd(topic, payload):
-        global car_active, _is_capturing
+        global car_active
+
+        # Joystick streams arrive at up to ~50 Hz: handle before any logging
+        try:
+            duties = parse_drive(payload)
+        except (TypeError, ValueError) as e:
+            print("[CMD] Bad drive command:", e)
+            return
+        if duties is not None:
+            car.current_mode = "manual"
+            car_active = True
+            car.maneuvers.stop()
+            car.motor.set_motor_model(*duties)
+            return
+
         print("[MQTT CMD]", topic, payload)
 
+        # Batched publish from the dashboard: {"commands": [...], "car_id": ...}
+        if isinstance(payload, dict) and isinstance(payload.get("commands"), list):
+            for c in payload["commands"]:
+                _on_cmd(topic, c if isinstance(c, dict) else {"value": c})
+            return
+
         cmd = None
         mode_value = None
 
@@ -171,12 +215,11 @@ def on_command_factory(car, buzzer, camera, mqtt):
                 print("[CMD] Stop command received.")
                 car_active = False
                 try:
+                    car.maneuvers.stop()
                     car.motor.set_motor_model(0, 0, 0, 0)
                     buzzer.set_state(False)
                 except Exception:
                     pass
-                with _capture_lock:
-                    _is_capturing = False
                 return
 
             if cmd_norm == "start":
@@ -188,6 +231,7 @@ def on_command_factory(car, buzzer, camera, mqtt):
             if mode_value:
                 m = mode_value
                 if m in ("ultrasonic", "infrared", "infrared_ultrasonic", "light", "manual"):
+                    car.maneuvers.stop()
                     car.current_mode = m
                     car_active = True
                 return
@@ -195,6 +239,7 @@ def on_command_factory(car, buzzer, camera, mqtt):
             if cmd_norm.startswith("mode_"):
                 m = cmd_norm[len("mode_"):]
                 if m in ("ultrasonic", "infrared", "infrared_ultrasonic", "light", "manual"):
+                    car.maneuvers.stop()
                     car.current_mode = m
                     car_active = True
                     return
@@ -208,6 +253,13 @@ def on_command_factory(car, buzzer, camera, mqtt):
                 _execute_manual_command(car, buzzer, cmd_norm)
                 return
 
+            # Maneuvers (advanced by the main loop, preempted by any movement command)
+            if cmd_norm in MANEUVERS:
+                car.current_mode = "manual"
+                car_active = True
+                car.maneuvers.start(MANEUVERS[cmd_norm](car), cmd_norm)
+                return
+
             # LED commands
             if cmd_norm in ("led_on", "led_off", "led1_on", "led1_off", "led2_on", "led2_off"):
                 try:
@@ -228,18 +280,24 @@ def on_command_factory(car, buzzer, camera, mqtt):
                     print("[LED CMD] Error:", e)
                 return
 
+            # Remote profiling window; results are published when it ends
+            if cmd_norm == "profile":
+                if profiler is None:
+                    print("[CMD] Profiler not available")
+                    return
+                seconds = payload.get("seconds", PROFILE_SECONDS) if isinstance(payload, dict) else PROFILE_SECONDS
+                if not profiler.start(seconds, reason="mqtt"):
+                    print("[CMD] Profile already running")
+                return
+
             # Take photo / capture
             if cmd_norm in ("take_photo", "capture"):
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 img_path = os.path.join(CAPTURE_DIR, f"manual_{timestamp}.jpg")
-                with _capture_lock:
-                    already = _is_capturing
-                if not already:
-                    t = threading.Thread(target=_capture_image_thread, args=(camera, img_path, mqtt), daemon=True)
-                    t.start()
-                    print("[CMD] capture started:", img_path)
+                if capture.submit(img_path, origin="manual"):
+                    print("[CMD] capture queued:", img_path)
                 else:
-                    print("[CMD] capture already in progress")
+                    print("[CMD] capture dropped (queue full)")
                 return
 
             print(f"[CMD] Unhandled command: {cmd_norm}")
@@ -250,37 +308,16 @@ def on_command_factory(car, buzzer, camera, mqtt):
     return _on_cmd
 
 
-def collect_telemetry(car, mode):
-    data = {
-        "mode": mode,
-        "simulate": car.simulate,
-        "ir": None,
-        "distance": None,
-        "battery": None,
-        "motor": getattr(car.motor, "last", None),
-        "car_active": car_active,
-    }
-    try:
-        data["ir"] = car.infrared.read_all_infrared()
-    except Exception:
-        data["ir"] = None
-    try:
-        data["distance"] = car.sonic.get_distance()
-    except Exception:
-        data["distance"] = None
-    try:
-        data["battery"] = car.adc.read_adc(2) * (3 if getattr(car.adc, "pcb_version", 2) == 1 else 2)
-    except Exception:
-        data["battery"] = None
-    data["ts"] = datetime.utcnow().isoformat() + "Z"
-    return data
-
-
-def main(simulate=False):
-    global running, car_active, _is_capturing
+def main(simulate=False, vision=None, profile_seconds=None, profile_interval=PROFILE_INTERVAL):
+    """vision: a started VisionStage without a camera yet (see __main__), or None."""
+    global running, car_active
 
     car = create_car(simulate=simulate)
     camera = Camera()
+    if vision is not None:
+        vision.camera = camera
+        # Frames taken while driving skip the frame-motion part of obstacle detection
+        vision.moving = lambda: any(car.motor.last)
     initial_mode = "infrared_ultrasonic" if not simulate else "simulate"
     car.current_mode = initial_mode
 
@@ -291,25 +328,91 @@ def main(simulate=False):
     # Local DB + Cloud Sync
     os.makedirs(os.path.dirname(LOCAL_DB_FILE), exist_ok=True)
     local_db = LocalDB(LOCAL_DB_FILE)
-    cloud_sync = CloudSync(CLOUD_DB_URL, local_db, interval=30)
+    cloud_sync = CloudSync(CLOUD_DB_URL, local_db, interval=30, car_id=CAR_ID)
     cloud_sync.start()
 
-    mqtt = MQTTClient(on_command=on_command_factory(car, buzzer, camera, None))  # temp None
+    mqtt = MQTTClient(car_id=CAR_ID)
+    capture = CapturePipeline(camera, mqtt=mqtt, image_topic=IMAGE_FEED,
+                              workers=CAPTURE_WORKERS, queue_size=CAPTURE_QUEUE_SIZE,
+                              drop_policy=CAPTURE_DROP_POLICY)
+    capture.start()
+    clips = ClipRecorder(camera, CAPTURE_DIR, pre_seconds=CLIP_PRE_SECONDS,
+                         post_seconds=CLIP_POST_SECONDS,
+                         quota_bytes=CAPTURE_QUOTA_MB * 1024 * 1024)
+    clips.start()
+
+    def _profile_done(summary):
+        # Compact result on the telemetry feed; the full files stay on the car
+        report = {"event": "profile", "car_id": CAR_ID,
+                  **{k: summary[k] for k in ("started", "seconds", "samples", "profiler_cpu_pct", "threads", "files")},
+                  "hottest": summary["hottest"][:5]}
+        log_jsonl(dict(report))
+        try:
+            mqtt.publish(MQTT_TELEMETRY_FEED, json.dumps(report))
+        except Exception as e:
+            print("[PROFILE] Publish failed:", e)
+
+    profiler = SamplingProfiler(PROFILE_DIR, interval=profile_interval, on_done=_profile_done)
+    mqtt.on_command = on_command_factory(car, buzzer, capture, profiler)
     mqtt.connect()
-    mqtt.on_command = on_command_factory(car, buzzer, camera, mqtt)
 
-    print(f"[INFO] Starting main loop (simulate={simulate}) mode={car.current_mode}")
+    # Optional direct UDP control; Adafruit IO commands keep working alongside it
+    control = None
+    if CONTROL_KEY:
+        def _deadman_stop():
+            if car.current_mode == "manual":
+                car.motor.set_motor_model(0, 0, 0, 0)
+
+        control = ControlServer(CONTROL_KEY, mqtt.on_command, _deadman_stop, port=CONTROL_PORT,
+                                deadman_timeout=CONTROL_DEADMAN_SECONDS)
+        try:
+            control.start()
+        except OSError as e:
+            print("[CONTROL] Direct control disabled:", e)
+            control = None
+
+    watchdog = SafetyWatchdog(car.motor, rate_hz=WATCHDOG_RATE_HZ, on_trip=log_jsonl)
+    # Registered from the main thread, so stall snapshots show the control loop's stack
+    # Only enforced while the wheels turn or a maneuver runs, so a stalled
+    # loop with the car standing still does not count as a trip
+    watchdog.register("loop", WATCHDOG_LOOP_TIMEOUT,
+                      armed=lambda: any(car.motor.last) or car.maneuvers.active)
+    watchdog.register("link", WATCHDOG_LINK_TIMEOUT,
+                      armed=lambda: car_active and car.current_mode == "manual" and any(car.motor.last))
+    watchdog.start()
+
+    if metrics.enabled and METRICS_PORT:
+        try:
+            metrics.serve(METRICS_PORT)
+        except OSError as e:
+            print("[METRICS] Endpoint disabled:", e)
+    loop_period = metrics.histogram("loop.period", "Time between control loop iterations")
+    last_tick = None
+
+    if profile_seconds:
+        profiler.start(profile_seconds, reason="startup")
+
+    print(f"[INFO] Starting main loop (car_id={CAR_ID}, simulate={simulate}) mode={car.current_mode}")
 
     last_telemetry = 0
     buzzer_on = False
 
     try:
         while running:
+            watchdog.feed("loop")
+            if metrics.enabled:
+                tick = time.perf_counter()
+                if last_tick is not None:
+                    loop_period.record(tick - last_tick)
+                last_tick = tick
+            if mqtt.is_connected() or (control is not None and control.active()):
+                watchdog.feed("link")
             try:
                 mode = getattr(car, "current_mode", initial_mode)
 
                 if not car_active:
                     try:
+                        car.maneuvers.stop()
                         car.motor.set_motor_model(0, 0, 0, 0)
                     except Exception:
                         pass
@@ -322,19 +425,32 @@ def main(simulate=False):
                     time.sleep(0.1)
                     continue
 
+                # A running maneuver owns the motors until it ends or is preempted
+                if car.maneuvers.tick():
+                    time.sleep(0.02)
+                    continue
+
                 # --- Autonomous modes ---
                 if mode == "infrared_ultrasonic":
+                    if buzzer_on:
+                        # Previous avoidance maneuver finished
+                        buzzer.set_state(False)
+                        buzzer_on = False
+
                     distance = car.sonic.get_distance()
                     ir_bits = car.infrared.read_all_infrared()
                     left = (ir_bits >> 2) & 1
                     mid = (ir_bits >> 1) & 1
                     right = ir_bits & 1
 
-                    print(f"[SENSORS] IR={ir_bits:03b} (L:{left} M:{mid} R:{right}) | Distance={distance}")
+                    seen = vision.latest() if vision is not None else None
+
+                    _sensor_log.info("reading", left=left, mid=mid, right=right, distance=distance)
 
                     # --- Obstacle avoidance ---
-                    if distance is not None and distance < 20:
-                        print("[AVOID] Obstacle detected — stopping.")
+                    vision_obstacle = seen is not None and seen["obstacle"]
+                    if (distance is not None and distance < 20) or vision_obstacle:
+                        print("[AVOID] Obstacle detected%s — stopping." % (" (vision)" if vision_obstacle else ""))
                         car.motor.set_motor_model(0, 0, 0, 0)
 
                         if not buzzer_on:
@@ -343,22 +459,12 @@ def main(simulate=False):
 
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         img_path = os.path.join(CAPTURE_DIR, f"obstacle_{timestamp}.jpg")
-                        with _capture_lock:
-                            already = _is_capturing
-                        if not already:
-                            t = threading.Thread(target=_capture_image_thread, args=(camera, img_path, mqtt), daemon=True)
-                            t.start()
+                        capture.submit(img_path, origin="obstacle")
+                        clips.trigger(os.path.join(CAPTURE_DIR, f"obstacle_{timestamp}.h264"))
 
                         print("[AVOID] Reversing...")
-                        car.motor.set_motor_model(-500, -500, -500, -500)
-                        time.sleep(0.8)
-                        car.motor.set_motor_model(0, 0, 0, 0)
-
-                        if buzzer_on:
-                            buzzer.set_state(False)
-                            buzzer_on = False
-
-                        time.sleep(0.05)
+                        car.maneuvers.start(
+                            maneuvers.sequence(car.motor, [((-500, -500, -500, -500), 0.8)]), "avoid_reverse")
                         continue
 
                     # --- Line tracking ---
@@ -374,16 +480,33 @@ def main(simulate=False):
                         car.motor.set_motor_model(700, 700, 600, 600)
                     elif left == 1 and mid == 1 and right == 1:
                         car.motor.set_motor_model(700, 700, 700, 700)
+                    elif seen is not None and seen["line_offset"] is not None:
+                        # IR lost the line: steer toward the camera's line estimate
+                        if seen["line_offset"] < -0.2:
+                            car.motor.set_motor_model(400, 400, 700, 700)
+                        elif seen["line_offset"] > 0.2:
+                            car.motor.set_motor_model(700, 700, 400, 400)
+                        else:
+                            car.motor.set_motor_model(500, 500, 500, 500)
                     else:
                         car.motor.set_motor_model(300, 300, 300, 300)
 
                     time.sleep(0.05)
+                else:
+                    # Manual and other modes are driven by commands; pace the loop
+                    # instead of spinning (which starves the watchdog and MQTT threads)
+                    time.sleep(0.02)
 
                 # Telemetry interval
                 now = time.time()
                 if now - last_telemetry > 10.0:
                     last_telemetry = now
-                    telem = collect_telemetry(car, mode)
+                    telem = collect_telemetry(car, mode, CAR_ID, car_active)
+                    telem["watchdog"] = watchdog.snapshot()
+                    if metrics.enabled:
+                        telem["metrics"] = metrics.snapshot()
+                    if vision is not None:
+                        telem["vision"] = vision.latest()
                     log_jsonl(telem)
                     local_db.insert_telemetry(telem)
                     try:
@@ -397,11 +520,32 @@ def main(simulate=False):
 
     finally:
         print("[INFO] Shutting down...")
+        watchdog.stop()
+        # Ctrl+C during a --profile window still writes what was sampled
+        profiler.stop()
         try:
             buzzer.set_state(False)
             buzzer.close()
         except Exception:
             pass
+        try:
+            capture.stop()
+        except Exception:
+            pass
+        try:
+            clips.stop()
+        except Exception:
+            pass
+        if control is not None:
+            try:
+                control.stop()
+            except Exception:
+                pass
+        if vision is not None:
+            try:
+                vision.stop()
+            except Exception:
+                pass
         try:
             camera.close()
         except Exception:
@@ -418,14 +562,31 @@ def main(simulate=False):
             cloud_sync.stop()
         except Exception:
             pass
+        log.shutdown()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", choices=["simulate", "hardware"], default="hardware")
+    parser.add_argument("--vision", action="store_true", help="enable camera-based line/obstacle detection")
+    parser.add_argument("--log-level", default=None, type=str.upper, choices=log.LEVELS,
+                        help="DEBUG shows per-tick sensor and simulated PWM output")
+    parser.add_argument("--log-format", choices=["text", "json"], default="text")
+    parser.add_argument("--profile", nargs="?", type=float, const=PROFILE_SECONDS, default=None, metavar="SECONDS",
+                        help=f"sample every thread for SECONDS (default {PROFILE_SECONDS}) and write a flame graph to {PROFILE_DIR}")
+    parser.add_argument("--profile-interval", type=float, default=PROFILE_INTERVAL, metavar="SECONDS",
+                        help="time between profiler samples")
     args = parser.parse_args()
+    # The vision worker is forked, so start it while this is the only thread:
+    # before the log writer, the camera (libcamera) and the car's threads
+    vision = None
+    if args.vision:
+        vision = VisionStage(None)
+        vision.start()
+    log.setup(level=args.log_level, fmt=args.log_format)
     simulate = args.mode == "simulate"
-    main(simulate=simulate)
+    main(simulate=simulate, vision=vision, profile_seconds=args.profile,
+         profile_interval=args.profile_interval)
 
 
 # Infrared (line) sensors with simulation fallback
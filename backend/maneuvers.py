@@ -0,0 +1,154 @@
+# maneuvers.py — Non-blocking motion primitives
+#
+# Each maneuver is a generator that sets wheel duties and yields instead of
+# sleeping. The control loop advances the active one once per tick through
+# ManeuverRunner.tick(); a stop (or any new command) preempts it between two
+# ticks, so nothing waits for a sleep to finish.
+#
+# Duties use the Ordinary_Car.set_motor_model order (FL, BL, FR, BR).
+import math
+import threading
+import time
+
+STOP = (0, 0, 0, 0)
+# Heading change while spinning in place at SPIN_DUTY, measured on a charged
+# pack; recalibrate after changing wheels or SPIN_DUTY
+SPIN_DUTY = 1500
+SPIN_DEGREES_PER_SECOND = 180.0
+
+
+def _hold(motor, duties, seconds):
+    """Apply duties and yield until `seconds` have passed."""
+    motor.set_motor_model(*duties)
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        yield
+
+
+def sequence(motor, steps):
+    """Run (duties, seconds) steps back to back, then stop."""
+    try:
+        for duties, seconds in steps:
+            yield from _hold(motor, duties, seconds)
+    finally:
+        motor.set_motor_model(*STOP)
+
+
+def spin(motor, seconds, direction=1, duty=SPIN_DUTY):
+    """Spin in place; direction +1 counter-clockwise (left), -1 clockwise (right)."""
+    d = duty * (1 if direction >= 0 else -1)
+    return sequence(motor, [((-d, -d, d, d), seconds)])
+
+
+def rotate_by(motor, degrees, duty=SPIN_DUTY, time_scale=1.0):
+    """
+    Turn in place by roughly `degrees` (positive = counter-clockwise), open loop.
+    time_scale stretches the timing (e.g. BatteryMonitor.residual()).
+    """
+    rate = SPIN_DEGREES_PER_SECOND * duty / SPIN_DUTY
+    seconds = abs(degrees) / rate * time_scale
+    return spin(motor, seconds, 1 if degrees >= 0 else -1, duty)
+
+
+def reverse_and_turn(motor, reverse_seconds=0.3, turn_seconds=0.3, reverse_duty=600, turn_duty=400,
+                     direction=1):
+    """Back away from an obstacle, then pivot (direction +1 left, -1 right)."""
+    t = turn_duty * (1 if direction >= 0 else -1)
+    return sequence(motor, [
+        ((-reverse_duty,) * 4, reverse_seconds),
+        ((-t, -t, t, t), turn_seconds),
+    ])
+
+
+def arc(motor, seconds, speed=700, turn=0.5):
+    """
+    Drive along an arc. turn in [-1, 1]: +1 pivots left around the left
+    wheels, 0 is straight, -1 pivots right.
+    """
+    turn = max(-1.0, min(1.0, turn))
+    left = int(speed * (1 - max(turn, 0)))
+    right = int(speed * (1 + min(turn, 0)))
+    return sequence(motor, [((left, left, right, right), seconds)])
+
+
+def rotate_sweep(motor, start_angle=0, step=5, step_seconds=0.015, power=2000, time_scale=1.0):
+    """
+    Mecanum spin while sweeping the travel direction by `step` degrees every
+    step_seconds (the former Car.mode_rotate loop). Runs until preempted.
+    """
+    angle = start_angle
+    try:
+        while True:
+            vy = int(power * math.cos(math.radians(angle)))
+            vx = -int(power * math.sin(math.radians(angle)))
+            w = power
+            fr = vy - vx + w
+            fl = vy + vx - w
+            bl = vy - vx - w
+            br = vy + vx + w
+            yield from _hold(motor, (fl, bl, fr, br), step_seconds * time_scale)
+            angle -= step
+    finally:
+        motor.set_motor_model(*STOP)
+
+
+class ManeuverRunner:
+    def __init__(self, motor):
+        """
+        Holds at most one active maneuver. tick() is called from the control
+        loop; start()/stop() may be called from any thread (MQTT, direct
+        control) and take effect before the next tick.
+        """
+        self.motor = motor
+        self._lock = threading.Lock()
+        self._gen = None
+        self._on_done = None
+        self.name = None
+
+    @property
+    def active(self):
+        return self._gen is not None
+
+    def start(self, maneuver, name="maneuver", on_done=None):
+        """Replace whatever is running with `maneuver` (a generator) and run its first step."""
+        with self._lock:
+            self._close_locked()
+            self._gen, self.name, self._on_done = maneuver, name, on_done
+            self._advance_locked()
+
+    def tick(self):
+        """Advance the active maneuver one step; returns True while one is running."""
+        with self._lock:
+            if self._gen is None:
+                return False
+            self._advance_locked()
+            return self._gen is not None
+
+    def stop(self):
+        """Preempt the active maneuver (its cleanup stops the motors)."""
+        with self._lock:
+            self._close_locked()
+
+    def _advance_locked(self):
+        try:
+            next(self._gen)
+        except StopIteration:
+            self._finish_locked()
+        except Exception as e:
+            print(f"[MANEUVER] {self.name} failed:", e)
+            self._close_locked()
+
+    def _finish_locked(self):
+        on_done = self._on_done
+        self._gen = self._on_done = self.name = None
+        if on_done:
+            try:
+                on_done()
+            except Exception as e:
+                print("[MANEUVER] on_done error:", e)
+
+    def _close_locked(self):
+        gen = self._gen
+        self._gen = self._on_done = self.name = None
+        if gen is not None:
+            gen.close()
@@ -0,0 +1,289 @@
+# metrics.py — In-process counters, gauges and latency histograms
+#
+#   from metrics import timed, REGISTRY
+#
+#   @timed("ultrasonic.get_distance")
+#   def get_distance(self): ...
+#
+#   with REGISTRY.timer("loop.tick"):
+#       ...
+#
+# Set SMARTCAR_METRICS=0 to disable: @timed then returns the function
+# untouched and timer() hands back a shared no-op context, so instrumented
+# hot paths cost nothing extra.
+#
+# Histograms are HDR-style log-linear: values (microseconds) below 32 get
+# their own bucket, above that each power of two is split into 16 buckets,
+# so any percentile is within ~6% of the true value using a few hundred
+# integers at most, whatever the range.
+import os
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv("SMARTCAR_METRICS", "1") not in ("0", "false", "no")
+
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS          # 32 exact buckets
+HALF = SUB_COUNT >> 1              # 16 buckets per power of two above that
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _bucket_index(v):
+    if v < SUB_COUNT:
+        return v
+    shift = v.bit_length() - SUB_BITS
+    return shift * HALF + (v >> shift)
+
+
+def _bucket_value(idx):
+    """Midpoint of a bucket, in the recorded unit."""
+    if idx < SUB_COUNT:
+        return float(idx)
+    shift = idx // HALF - 1
+    top = idx - shift * HALF
+    low = top << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    kind = "summary"
+
+    def __init__(self, name, help_text=""):
+        """Latency histogram; record() takes seconds, stores whole microseconds."""
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        us = int(seconds * 1_000_000)
+        if us < 0:
+            us = 0
+        idx = _bucket_index(us)
+        with self._lock:
+            self._buckets[idx] = self._buckets.get(idx, 0) + 1
+            self.count += 1
+            self.sum += seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+
+    def percentiles(self, qs=QUANTILES):
+        """{q: seconds} estimated from the buckets, clamped to the observed min/max."""
+        with self._lock:
+            items = sorted(self._buckets.items())
+            total = self.count
+            lo, hi = self.min, self.max
+        out = {}
+        if not total:
+            return {q: None for q in qs}
+        for q in qs:
+            rank = q * total
+            seen = 0
+            for idx, n in items:
+                seen += n
+                if seen >= rank:
+                    # A bucket midpoint can lie outside what was actually recorded
+                    out[q] = min(max(_bucket_value(idx) / 1_000_000, lo), hi)
+                    break
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._buckets = {}
+            self.count = 0
+            self.sum = 0.0
+            self.min = self.max = None
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record(time.perf_counter() - self.t0)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help_text):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help_text)
+        return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text=""):
+        return self._get(Histogram, name, help_text)
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    # --- export ---
+    def snapshot(self):
+        """Compact dict for the telemetry stream (latencies in ms)."""
+        out = {}
+        for name, m in list(self._metrics.items()):
+            if isinstance(m, Histogram):
+                if not m.count:
+                    continue
+                p = m.percentiles((0.5, 0.99))
+                out[name] = {"n": m.count,
+                             "p50_ms": round(p[0.5] * 1000, 3),
+                             "p99_ms": round(p[0.99] * 1000, 3),
+                             "max_ms": round(m.max * 1000, 3)}
+            elif isinstance(m, Counter):
+                # Zero counters (mostly *.errors) would only pad every telemetry record
+                if m.value:
+                    out[name] = m.value
+            elif m.value is not None:
+                out[name] = m.value
+        return out
+
+    def render_prometheus(self, prefix="smartcar_"):
+        lines = []
+        for name, m in sorted(self._metrics.items()):
+            metric = prefix + name.replace(".", "_").replace("-", "_")
+            # Prometheus naming: base unit suffix on latencies, _total on counters
+            if isinstance(m, Histogram):
+                metric += "_seconds"
+            elif isinstance(m, Counter) and not metric.endswith("_total"):
+                metric += "_total"
+            elif m.value is None:
+                continue
+            if m.help:
+                lines.append(f"# HELP {metric} {m.help}")
+            if isinstance(m, Histogram):
+                lines.append(f"# TYPE {metric} summary")
+                for q, v in m.percentiles().items():
+                    if v is not None:
+                        lines.append(f'{metric}{{quantile="{q}"}} {v:.6f}')
+                lines.append(f"{metric}_sum {m.sum:.6f}")
+                lines.append(f"{metric}_count {m.count}")
+            else:
+                lines.append(f"# TYPE {metric} {m.kind}")
+                lines.append(f"{metric} {m.value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="0.0.0.0"):
+        """Serve GET /metrics in Prometheus text format from a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[METRICS] Prometheus endpoint on http://{host}:{port}/metrics")
+        return server
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(name, registry=REGISTRY):
+    """Decorator recording each call's duration in histogram `name` (errors counted separately)."""
+    def decorator(fn):
+        if not registry.enabled:
+            return fn
+        hist = registry.histogram(name)
+        errors = registry.counter(name + ".errors")
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                hist.record(time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+def counter(name, help_text=""):
+    return REGISTRY.counter(name, help_text)
+
+
+def gauge(name, help_text=""):
+    return REGISTRY.gauge(name, help_text)
@@ -1,5 +1,11 @@
 # motor.py — Unified motor driver with PCA9685 hardware + simulation fallback
 import time
+import threading
+from metrics import timed
+from log import get_logger
+
+# Simulated writes happen several times per tick; sample them at DEBUG
+_sim_log = get_logger("sim motor").throttle(interval=0.5)
 
 try:
     import board
@@ -19,6 +25,11 @@ class Ordinary_Car:
         """
         self.simulate = simulate or (not HARDWARE)
         self.last = (0, 0, 0, 0)
+        # Optional object with a `scale` attribute (BatteryMonitor) applied to every duty
+        self.compensation = None
+        self.applied = (0, 0, 0, 0)
+        # The control loop, command handlers and the safety watchdog all write duties
+        self._lock = threading.Lock()
 
         if not self.simulate:
             try:
@@ -45,7 +56,7 @@ class Ordinary_Car:
     def _apply_pwm(self, channel, duty):
         """Convert duty (0–4095) to PCA9685 duty_cycle."""
         if self.simulate:
-            print(f"[SIM MOTOR] channel={channel} duty={duty}")
+            _sim_log.debug("pwm", channel=channel, duty=duty)
             return
 
         # Limit duty cycle between 0–4095
@@ -56,7 +67,7 @@ class Ordinary_Car:
     def _set_motor_pwm(self, channel_a, channel_b, duty):
         """Drive one motor pair (forward/back/stop)."""
         if self.simulate:
-            print(f"[SIM PWM] chA={channel_a} chB={channel_b} duty={duty}")
+            _sim_log.debug("pair", chA=channel_a, chB=channel_b, duty=duty)
             return
 
         if duty > 0:  # forward
@@ -83,20 +94,29 @@ class Ordinary_Car:
         self._set_motor_pwm(4, 5, duty)
 
     # --- public interface ---
+    @timed("motor.set_model")
     def set_motor_model(self, duty1, duty2, duty3, duty4):
         """
         Set PWM for all four wheels.
         duty1..4 correspond to:
           left_upper, left_lower, right_upper, right_lower
+        Duties are multiplied by the battery compensation scale (if set),
+        so every mode gets the same wheel speed as the pack drains.
         """
+        last = self._clip(duty1, duty2, duty3, duty4)
+        if self.compensation is not None:
+            k = self.compensation.scale
+            duty1, duty2, duty3, duty4 = (int(d * k) for d in last)
         duty1, duty2, duty3, duty4 = self._clip(duty1, duty2, duty3, duty4)
-        self.last = (duty1, duty2, duty3, duty4)
 
-        # Adjust signs if car moves the wrong way
-        self.left_upper_wheel(-duty1)
-        self.left_lower_wheel(duty2)
-        self.right_upper_wheel(-duty3)
-        self.right_lower_wheel(-duty4)
+        with self._lock:
+            self.last = last
+            self.applied = (duty1, duty2, duty3, duty4)
+            # Adjust signs if car moves the wrong way
+            self.left_upper_wheel(-duty1)
+            self.left_lower_wheel(duty2)
+            self.right_upper_wheel(-duty3)
+            self.right_lower_wheel(-duty4)
 
     def close(self):
         """Stop all motors and release resources."""
@@ -7,22 +7,33 @@ import ssl
 import paho.mqtt.client as mqtt
 from datetime import datetime
 from typing import Callable
+from log import get_logger
+from metrics import timed, counter
 from config import MQTT_BROKER, MQTT_PORT, MQTT_USERNAME, MQTT_KEY, MQTT_TELEMETRY_FEED, MQTT_COMMAND_FEED
 
+_publish_failures = counter("mqtt.publish.failures")
+# Joystick drive streams arrive at up to ~50 Hz: debug only, at most one line a second
+_message_log = get_logger("mqtt").throttle(interval=1.0)
+
 class MQTTClient:
-    def __init__(self, on_command: Callable[[str, dict], None] = None, use_tls=True):
+    def __init__(self, on_command: Callable[[str, dict], None] = None, use_tls=True, car_id=None, command_feed=None):
         """
         MQTT client wrapper for smart car with Adafruit IO support.
         on_command: callback for incoming commands
         use_tls: enable TLS/SSL connection
+        car_id: when set, JSON commands carrying a different "car_id" are ignored
+                (commands without car_id are broadcast to every car)
+        command_feed: feed to subscribe to (default MQTT_COMMAND_FEED)
         """
         self.on_command = on_command
         self.use_tls = use_tls
+        self.car_id = car_id
+        self.command_feed = command_feed or MQTT_COMMAND_FEED
         self._already_connected = False
         self._connected = threading.Event()
 
         # Use unique client_id per run
-        self.client = mqtt.Client(client_id=f"smartcar-{int(time.time())}")
+        self.client = mqtt.Client(client_id=f"smartcar-{car_id or 'car'}-{int(time.time())}")
 
         # Enable debug logging
         self.client.enable_logger()
@@ -48,13 +59,14 @@ class MQTTClient:
                 print("[MQTT] Connected successfully!")
                 self._already_connected = True
             # Subscribe to command feed
-            client.subscribe(MQTT_COMMAND_FEED)
+            client.subscribe(self.command_feed)
             self._connected.set()
         else:
             print(f"[MQTT] Connect failed, return code={rc}")
 
     def _on_disconnect(self, client, userdata, rc):
         print(f"[MQTT] Disconnected with return code={rc}")
+        self._connected.clear()
         # Auto-reconnect if disconnected unexpectedly
         if rc != 0:
             print("[MQTT] Attempting to reconnect in 5 seconds...")
@@ -68,7 +80,10 @@ class MQTTClient:
         try:
             payload = msg.payload.decode("utf-8")
             data = json.loads(payload) if payload.strip().startswith("{") else {"value": payload}
-            print(f"[MQTT] Message received on {msg.topic}: {payload}")
+            _message_log.debug("message received", topic=msg.topic, payload=payload)
+            target = data.get("car_id")
+            if target and self.car_id and target not in (self.car_id, "all"):
+                return
             if self.on_command:
                 self.on_command(msg.topic, data)
         except Exception as e:
@@ -77,23 +92,29 @@ class MQTTClient:
     def connect(self):
         try:
             print(f"[MQTT] Connecting to {MQTT_BROKER}:{MQTT_PORT} as {MQTT_USERNAME}")
-            self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            # Short keepalive so a dead link is noticed within ~1.5x this many seconds
+            self.client.connect(MQTT_BROKER, MQTT_PORT, 15)
         except Exception as e:
             print("[MQTT] Connection error:", e)
             return
 
         # Start loop in background thread
-        thread = threading.Thread(target=self.client.loop_forever, daemon=True)
+        thread = threading.Thread(target=self.client.loop_forever, name="mqtt-network", daemon=True)
         thread.start()
 
         # Wait for connection with timeout
         if not self._connected.wait(timeout=10):
             print("[MQTT] Warning: Could not establish connection in 10 seconds")
 
+    def is_connected(self):
+        return self._connected.is_set()
+
+    @timed("mqtt.publish")
     def publish(self, topic, payload):
         try:
             self.client.publish(topic, payload, qos=1)
         except Exception as e:
+            _publish_failures.inc()
             print("[MQTT] Publish failed:", e)
 
     def disconnect(self):
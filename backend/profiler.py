@@ -0,0 +1,239 @@
+# profiler.py — Sampling profiler across every thread of the backend
+#
+# A daemon thread wakes every `interval` seconds, grabs the current frame
+# of every other thread (sys._current_frames) and counts the stack. Nothing
+# is hooked into the profiled code, so overhead is the sampler's own CPU
+# (reported in the summary) and the loop, MQTT, CloudSync and capture
+# threads keep their normal timing while a window runs.
+#
+# Samples are wall-clock: a thread blocked in sleep()/select() shows up in
+# its waiting frame. The per-thread CPU figures (from each thread's CPU
+# clock) tell busy threads from waiting ones.
+#
+# Output per window, in out_dir:
+#   profile-<stamp>.collapsed   "thread;outer;...;inner count" (flamegraph.pl, speedscope)
+#   profile-<stamp>.svg         self-contained flame graph (open in a browser)
+#   profile-<stamp>.json        summary: per-thread samples/CPU, hottest frames
+import html
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_INTERVAL = 0.01
+MAX_SECONDS = 300
+
+SVG_WIDTH = 1200
+SVG_ROW = 16
+SVG_MIN_WIDTH = 0.3
+
+
+def _thread_cpu(ident):
+    """CPU seconds used so far by the thread with threading ident `ident` (None if unavailable)."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class SamplingProfiler:
+    def __init__(self, out_dir, interval=DEFAULT_INTERVAL, on_done=None):
+        """
+        out_dir: where the .collapsed/.svg/.json files go
+        interval: seconds between samples (0.01 = 100 Hz)
+        on_done(summary): called from the sampler thread when a window ends
+        """
+        self.out_dir = out_dir
+        self.interval = interval
+        self.on_done = on_done
+        self._thread = None
+        self._stop = threading.Event()
+        self._labels = {}
+        self.last = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, reason="manual"):
+        """Profile for `seconds` in the background; returns False if a window is already running."""
+        if self.running:
+            return False
+        seconds = max(1.0, min(float(seconds), MAX_SECONDS))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(seconds, reason), name="profiler", daemon=True)
+        self._thread.start()
+        print(f"[PROFILE] Sampling all threads for {seconds:.0f}s every {self.interval * 1000:.0f} ms ({reason})")
+        return True
+
+    def stop(self):
+        """End the current window early; its output is still written."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    # --- sampling ---
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self, seconds, reason):
+        me = threading.get_ident()
+        stacks = Counter()
+        thread_samples = Counter()
+        names = {}
+        cpu_start = {t.ident: _thread_cpu(t.ident) for t in threading.enumerate() if t.ident != me}
+        wall_start = time.monotonic()
+        own_cpu_start = time.thread_time()
+        deadline = wall_start + seconds
+        next_tick = wall_start
+        samples = 0
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                parts = []
+                while frame is not None:
+                    parts.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                name = names.get(ident, f"thread-{ident}")
+                parts.append(name)
+                parts.reverse()
+                stacks[";".join(parts)] += 1
+                thread_samples[name] += 1
+            samples += 1
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+        wall = time.monotonic() - wall_start
+        overhead = time.thread_time() - own_cpu_start
+        threads = {}
+        for t in threading.enumerate():
+            if t.ident == me:
+                continue
+            end = _thread_cpu(t.ident)
+            begin = cpu_start.get(t.ident, 0.0)
+            cpu = None if end is None or begin is None else end - begin
+            threads[t.name] = {
+                "samples": thread_samples.get(t.name, 0),
+                "cpu_s": None if cpu is None else round(cpu, 3),
+                "cpu_pct": None if cpu is None else round(cpu / wall * 100, 1),
+            }
+        for name, n in thread_samples.items():
+            # Threads that exited during the window: samples only
+            threads.setdefault(name, {"samples": n, "cpu_s": None, "cpu_pct": None})
+
+        summary = self._write(stacks, {
+            "reason": reason,
+            "started": datetime.fromtimestamp(time.time() - wall).isoformat(timespec="seconds"),
+            "seconds": round(wall, 2),
+            "interval": self.interval,
+            "samples": samples,
+            "profiler_cpu_pct": round(overhead / wall * 100, 2) if wall else None,
+            "threads": dict(sorted(threads.items(), key=lambda kv: -(kv[1]["cpu_s"] or 0))),
+            "hottest": self._hottest(stacks),
+        })
+        self.last = summary
+        print(f"[PROFILE] {samples} samples in {wall:.1f}s -> {summary['files']['svg']}")
+        if self.on_done:
+            try:
+                self.on_done(summary)
+            except Exception as e:
+                print("[PROFILE] on_done error:", e)
+
+    @staticmethod
+    def _hottest(stacks, limit=15):
+        """Innermost frames by sample count (where threads were when sampled)."""
+        leaf = Counter()
+        total = sum(stacks.values()) or 1
+        for stack, n in stacks.items():
+            thread, _, rest = stack.partition(";")
+            leaf[f"{thread}: {rest.rsplit(';', 1)[-1] if rest else '?'}"] += n
+        return [{"frame": f, "pct": round(n / total * 100, 1)} for f, n in leaf.most_common(limit)]
+
+    # --- output ---
+    def _write(self, stacks, summary):
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, "profile-" + datetime.now().strftime("%Y%m%d_%H%M%S"))
+        summary["files"] = {"collapsed": base + ".collapsed", "svg": base + ".svg", "json": base + ".json"}
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, n in sorted(stacks.items()):
+                f.write(f"{stack} {n}\n")
+        with open(base + ".svg", "w", encoding="utf-8") as f:
+            f.write(render_flamegraph(stacks, f"Smart Car backend — {summary['seconds']}s, "
+                                              f"{summary['samples']} samples ({summary['reason']})"))
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+    def snapshot(self):
+        last = self.last
+        return {
+            "running": self.running,
+            "last": None if last is None else {k: last[k] for k in ("started", "seconds", "samples", "files")},
+        }
+
+
+def render_flamegraph(stacks, title=""):
+    """Minimal flame graph SVG (roots at the top) from a {collapsed_stack: count} mapping."""
+    total = sum(stacks.values())
+    root = {}
+    for stack, n in stacks.items():
+        children = root
+        for frame in stack.split(";"):
+            node = children.setdefault(frame, [0, {}])
+            node[0] += n
+            children = node[1]
+
+    rects = []
+
+    def layout(children, x, depth):
+        for name, (n, sub) in sorted(children.items()):
+            w = n / total * SVG_WIDTH if total else 0
+            if w >= SVG_MIN_WIDTH:
+                rects.append((x, depth, w, name, n))
+                layout(sub, x, depth + 1)
+            x += w
+
+    layout(root, 0.0, 0)
+    depth = max((r[1] for r in rects), default=0) + 1
+    top = 24
+    height = top + depth * SVG_ROW + 4
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="15">{html.escape(title)}</text>',
+    ]
+    for x, d, w, name, n in rects:
+        hue = zlib.crc32(name.encode()) % 40
+        y = top + d * SVG_ROW
+        label = html.escape(name)
+        chars = int(w / 6.6)
+        text = ""
+        if chars >= 3:
+            short = name if len(name) <= chars else name[:chars - 2] + ".."
+            text = f'<text x="{x + 2:.1f}" y="{y + 11}">{html.escape(short)}</text>'
+        out.append(
+            f'<g><title>{label} — {n} samples ({n / total * 100:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{SVG_ROW - 1}" '
+            f'fill="hsl({hue + 10},85%,{60 + hue % 15}%)"/>{text}</g>'
+        )
+    out.append("</svg>")
+    return "\n".join(out) + "\n"
@@ -1,18 +1,43 @@
 # src/sync_to_cloud.py
 import time, os, threading, json
 import psycopg2
+from datetime import datetime
 from urllib.parse import urlparse
+from cloud_schema import migrate, ensure_partition, update_rollups
 
 def _connect(url):
+    # Cloud databases need TLS; a URL that sets sslmode itself (local Postgres) wins
+    if "sslmode=" in url:
+        return psycopg2.connect(url)
     return psycopg2.connect(url, sslmode='require')
 
+def _parse_ts(ts):
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+def _parse_motor(motor):
+    """LocalDB stores the motor tuple as text, e.g. '(800, 800, 800, 800)'."""
+    if motor is None:
+        return None
+    if isinstance(motor, (list, tuple)):
+        return list(motor)
+    try:
+        return [int(float(v)) for v in str(motor).strip("()[] ").split(",") if v.strip()]
+    except ValueError:
+        return None
+
 class CloudSync:
-    def __init__(self, db_url, local_db: 'LocalDB', interval=30):
+    def __init__(self, db_url, local_db: 'LocalDB', interval=30, car_id=None):
         self.db_url = db_url
+        self.car_id = car_id
         self.local_db = local_db
         self.interval = interval
         self._stop = threading.Event()
-        self._t = threading.Thread(target=self._run, daemon=True)
+        self._t = threading.Thread(target=self._run, name="cloud-sync", daemon=True)
+        self._migrated = False
+        self._months = set()
 
     def start(self):
         if self.db_url:
@@ -23,42 +48,63 @@ class CloudSync:
         self._t.join(timeout=2)
 
     def _ensure_table(self, conn):
-        with conn.cursor() as cur:
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS telemetry (
-                id SERIAL PRIMARY KEY,
-                ts TIMESTAMP WITH TIME ZONE,
-                mode TEXT,
-                ir INTEGER,
-                distance REAL,
-                battery REAL,
-                motor JSONB
-            );""")
-            conn.commit()
+        # Schema lives in cloud_schema.py (partitions, indexes, rollups); run once per process
+        if not self._migrated:
+            migrate(conn)
+            self._migrated = True
+
+    def _ensure_partitions(self, conn, rows):
+        months = {(t.year, t.month) for t in (_parse_ts(r['ts']) for r in rows) if t}
+        for year, month in months - self._months:
+            try:
+                with conn.cursor() as cur:
+                    ensure_partition(cur, datetime(year, month, 1).date())
+                conn.commit()
+                self._months.add((year, month))
+            except Exception as e:
+                # Rows still land in the DEFAULT partition
+                conn.rollback()
+                print("[SYNC] partition error:", e)
+
+    def sync_once(self, limit=200):
+        """Push one batch of unsynced rows to the cloud; returns how many were synced."""
+        unsynced = self.local_db.get_unsynced(limit=limit)
+        if not unsynced:
+            return 0
+        conn = _connect(self.db_url)
+        try:
+            self._ensure_table(conn)
+            self._ensure_partitions(conn, unsynced)
+            ids = []
+            rollup_rows = []
+            with conn.cursor() as cur:
+                for r in unsynced:
+                    ids.append(r['id'])
+                    motor = _parse_motor(r['motor'])
+                    # Rows buffered before fleet support have no car_id
+                    car_id = r.get('car_id') or self.car_id
+                    cur.execute("""
+                        INSERT INTO telemetry (ts, car_id, mode, ir, distance, battery, motor)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        (r['ts'], car_id, r['mode'], r['ir'], r['distance'], r['battery'], json.dumps(motor))
+                    )
+                    rollup_rows.append((car_id, r['ts'], r['ir'], r['distance'], r['battery'], motor[0] if motor else None))
+                # Same transaction: rollups never diverge from the raw rows
+                update_rollups(cur, rollup_rows)
+                conn.commit()
+        finally:
+            conn.close()
+        # mark as synced locally
+        self.local_db.mark_synced(ids)
+        return len(ids)
 
     def _run(self):
         while not self._stop.is_set():
             try:
-                unsynced = self.local_db.get_unsynced(limit=200)
-                if not unsynced:
+                if not self.sync_once():
                     time.sleep(self.interval)
                     continue
-                conn = _connect(self.db_url)
-                self._ensure_table(conn)
-                ids = []
-                with conn.cursor() as cur:
-                    for r in unsynced:
-                        ids.append(r['id'])
-                        cur.execute("""
-                            INSERT INTO telemetry (ts, mode, ir, distance, battery, motor)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            """,
-                            (r['ts'], r['mode'], r['ir'], r['distance'], r['battery'], json.dumps(r['motor']))
-                        )
-                    conn.commit()
-                conn.close()
-                # mark as synced locally
-                self.local_db.mark_synced(ids)
             except Exception as e:
                 print("[SYNC] error:", e)
             time.sleep(self.interval)
@@ -0,0 +1,38 @@
+# telemetry.py — Build the periodic telemetry record
+from datetime import datetime
+
+
+def collect_telemetry(car, mode, car_id, car_active):
+    """Periodic status record (the main loop adds watchdog/metrics/vision sections)."""
+    data = {
+        "car_id": car_id,
+        "mode": mode,
+        "simulate": car.simulate,
+        "ir": None,
+        "distance": None,
+        "battery": None,
+        "motor": getattr(car.motor, "last", None),
+        "car_active": car_active,
+    }
+    try:
+        data["ir"] = car.infrared.read_all_infrared()
+    except Exception:
+        data["ir"] = None
+    try:
+        data["distance"] = car.sonic.get_distance()
+    except Exception:
+        data["distance"] = None
+    battery = getattr(car, "battery", None)
+    if battery is not None and battery.voltage is not None:
+        # Filtered by the battery monitor thread: no extra I2C read here
+        snap = battery.snapshot()
+        data["battery"] = snap["voltage"]
+        data["battery_scale"] = snap["scale"]
+        data["motor_applied"] = getattr(car.motor, "applied", None)
+    else:
+        try:
+            data["battery"] = car.adc.read_adc(2) * (3 if getattr(car.adc, "pcb_version", 2) == 1 else 2)
+        except Exception:
+            data["battery"] = None
+    data["ts"] = datetime.utcnow().isoformat() + "Z"
+    return data
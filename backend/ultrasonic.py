@@ -1,5 +1,6 @@
 # Ultrasonic distance sensor with simulation fallback
 import time, random
+from metrics import timed
 try:
     from gpiozero import DistanceSensor, DistanceSensorNoEcho, PWMSoftwareFallback
     import warnings
@@ -17,6 +18,7 @@ class Ultrasonic:
         else:
             self.sensor = None
 
+    @timed("ultrasonic.get_distance")
     def get_distance(self):
         if self.simulate:
             return round(10 + random.random()*90, 1)
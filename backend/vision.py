@@ -0,0 +1,249 @@
+# vision.py — Optional camera-based line/obstacle detection in a worker process
+import time
+import queue
+import threading
+import multiprocessing as mp
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except Exception:
+    HAS_NUMPY = False
+
+
+# -------------------------
+# DETECTORS (pure NumPy, no camera dependency)
+# -------------------------
+def to_gray_small(frame, step=4):
+    """Downsample an HxWx3 (or HxW) uint8 frame by striding and convert to grayscale."""
+    small = frame[::step, ::step]
+    if small.ndim == 3:
+        # Integer luma approximation: (R*77 + G*150 + B*29) >> 8
+        rgb = small[..., :3].astype(np.uint16)
+        small = ((rgb[..., 0] * 77 + rgb[..., 1] * 150 + rgb[..., 2] * 29) >> 8).astype(np.uint8)
+    return np.ascontiguousarray(small)
+
+
+def line_centroid(gray, roi_fraction=0.3, dark_threshold=60):
+    """
+    Estimate where a dark line crosses the bottom of the image.
+    Returns (offset, coverage): offset in [-1, 1] (negative = left) or None
+    if no line pixels were found, coverage = fraction of ROI pixels on the line.
+    """
+    h, w = gray.shape
+    roi = gray[int(h * (1 - roi_fraction)):, :]
+    mask = roi < dark_threshold
+    col_counts = mask.sum(axis=0, dtype=np.int32)
+    total = int(col_counts.sum())
+    if total == 0:
+        return None, 0.0
+    cx = float(np.dot(col_counts, np.arange(w, dtype=np.int32))) / total
+    return (cx / (w - 1)) * 2.0 - 1.0, total / mask.size
+
+
+def edge_density(gray, edge_threshold=40, center_fraction=0.5):
+    """Fraction of pixels in the central window with a strong horizontal/vertical gradient."""
+    h, w = gray.shape
+    y0, x0 = int(h * (1 - center_fraction) / 2), int(w * (1 - center_fraction) / 2)
+    win = gray[y0:h - y0, x0:w - x0].astype(np.int16)
+    gx = np.abs(win[:, 1:] - win[:, :-1])[:-1, :]
+    gy = np.abs(win[1:, :] - win[:-1, :])[:, :-1]
+    edges = (gx + gy) > edge_threshold
+    return float(edges.mean()) if edges.size else 0.0
+
+
+def frame_motion(gray, prev, diff_threshold=25):
+    """Fraction of pixels that changed by more than diff_threshold since prev."""
+    if prev is None or prev.shape != gray.shape:
+        return 0.0
+    diff = np.abs(gray.astype(np.int16) - prev.astype(np.int16))
+    return float((diff > diff_threshold).mean())
+
+
+def analyze(gray, prev, params):
+    offset, coverage = line_centroid(gray, params["roi_fraction"], params["dark_threshold"])
+    edges = edge_density(gray, params["edge_threshold"])
+    motion = frame_motion(gray, prev, params["diff_threshold"])
+    return {
+        "line_offset": None if offset is None else round(offset, 3),
+        "line_coverage": round(coverage, 3),
+        "edge_density": round(edges, 3),
+        "motion": round(motion, 3),
+        "obstacle": edges > params["obstacle_edge_density"] and motion > params["obstacle_motion"],
+    }
+
+
+DEFAULT_PARAMS = {
+    "roi_fraction": 0.3,
+    "dark_threshold": 60,
+    "edge_threshold": 40,
+    "diff_threshold": 25,
+    "obstacle_edge_density": 0.25,
+    "obstacle_motion": 0.10,
+    # While the car moves, frame differencing sees its own motion everywhere:
+    # a stricter edge-density test decides alone
+    "obstacle_edge_density_moving": 0.35,
+}
+
+
+def _worker_main(frames, results, params):
+    """Runs in the child process: consume (ts, frame, moving) and emit result dicts."""
+    prev = None
+    prev_moving = False
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        ts, gray, moving = item
+        t0 = time.perf_counter()
+        res = analyze(gray, prev, params)
+        if moving or prev_moving:
+            res["obstacle"] = res["edge_density"] > params["obstacle_edge_density_moving"]
+        prev, prev_moving = gray, moving
+        res["moving"] = moving
+        res["frame_ts"] = ts
+        res["proc_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        try:
+            results.put_nowait(res)
+        except queue.Full:
+            pass
+
+
+# -------------------------
+# STAGE (parent process side)
+# -------------------------
+class VisionStage:
+    def __init__(self, camera, fps=10, step=4, max_age=0.5, params=None, moving=None):
+        """
+        Pull frames from `camera` at `fps`, downsample by `step` and analyse
+        them in a separate process so the detectors never hold the main
+        process GIL. latest() returns the newest result with timestamps.
+
+        camera may be None and set later (frames are skipped until then).
+        max_age: results older than this (seconds) are reported as stale.
+        moving(): True while the car drives; frames taken then (and the
+        first one after) use the edge-density test without frame motion.
+        """
+        self.camera = camera
+        self.moving = moving
+        self.fps = fps
+        self.step = step
+        self.max_age = max_age
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.enabled = HAS_NUMPY
+
+        # Queues of size 1-2: always work on the freshest frame, never build latency
+        ctx = mp.get_context("fork")
+        self._frames = ctx.Queue(maxsize=1)
+        self._results = ctx.Queue(maxsize=4)
+        self._proc = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._latest = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def start(self):
+        """
+        Start the worker process. It is forked, so call this while the
+        process is still single-threaded (before log.setup(), the camera
+        and the hardware threads); attach the camera afterwards.
+        """
+        if not self.enabled:
+            print("[VISION] NumPy not available, vision stage disabled.")
+            return
+        ctx = mp.get_context("fork")
+        self._proc = ctx.Process(target=_worker_main, args=(self._frames, self._results, self.params),
+                                 name="vision-worker", daemon=True)
+        self._proc.start()
+        for target, name in ((self._feed_loop, "vision-feed"), (self._result_loop, "vision-results")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[VISION] Started (fps={self.fps}, step={self.step}, pid={self._proc.pid})")
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=1)
+        self._threads = []
+        if self._proc is not None:
+            try:
+                self._frames.put(None, timeout=0.5)
+            except Exception:
+                pass
+            self._proc.join(timeout=1)
+            if self._proc.is_alive():
+                self._proc.terminate()
+            self._proc = None
+
+    def latest(self):
+        """Return the newest result dict (with 'ts' and 'age') or None if stale/missing."""
+        with self._lock:
+            res = self._latest
+        if res is None:
+            return None
+        age = time.time() - res["frame_ts"]
+        if age > self.max_age:
+            return None
+        return dict(res, age=round(age, 3))
+
+    # --- internal helpers ---
+    def _grab(self):
+        cam = getattr(self.camera, "camera", None)
+        if cam is None or not getattr(cam, "started", False):
+            return None
+        return cam.capture_array("main")
+
+    def _feed_loop(self):
+        period = 1.0 / self.fps
+        while not self._stop.is_set():
+            t0 = time.time()
+            try:
+                frame = self._grab()
+                if frame is not None:
+                    gray = to_gray_small(frame, self.step)
+                    moving = bool(self.moving()) if self.moving is not None else False
+                    try:
+                        self._frames.put_nowait((t0, gray, moving))
+                        self.frames_sent += 1
+                    except queue.Full:
+                        self.frames_skipped += 1
+            except Exception as e:
+                print("[VISION] Frame grab error:", e)
+                self._stop.wait(1.0)
+            self._stop.wait(max(0.0, period - (time.time() - t0)))
+
+    def _result_loop(self):
+        while not self._stop.is_set():
+            try:
+                res = self._results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            res["ts"] = time.time()
+            with self._lock:
+                self._latest = res
+
+
+def benchmark(width=640, height=480, step=4, n=300):
+    """Measure detector throughput (frames/second) on synthetic frames, CPU only."""
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+    params = dict(DEFAULT_PARAMS)
+
+    t0 = time.perf_counter()
+    prev = None
+    for i in range(n):
+        gray = to_gray_small(frames[i % len(frames)], step)
+        analyze(gray, prev, params)
+        prev = gray
+    elapsed = time.perf_counter() - t0
+    return {"width": width, "height": height, "step": step, "frames": n,
+            "fps": round(n / elapsed, 1), "ms_per_frame": round(elapsed / n * 1000, 3)}
+
+
+# --- Self-test section ---
+if __name__ == "__main__":
+    for step in (2, 4, 8):
+        print("[BENCH]", benchmark(step=step))
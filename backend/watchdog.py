@@ -0,0 +1,144 @@
+# watchdog.py — Independent motor safety stop
+#
+# The control loop and the command link each "feed" a channel. A separate
+# thread checks every channel at `rate_hz`; when one goes quiet past its
+# timeout it stops the wheels straight through Ordinary_Car, whatever the
+# stalled thread was doing, and records how long the stall lasted together
+# with a stack snapshot of the thread that owns the channel.
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+
+class _Channel:
+    __slots__ = ("name", "timeout", "armed", "thread_id", "last", "tripped_at")
+
+    def __init__(self, name, timeout, armed, thread_id):
+        self.name = name
+        self.timeout = timeout
+        self.armed = armed
+        self.thread_id = thread_id
+        self.last = time.monotonic()
+        self.tripped_at = None
+
+
+class SafetyWatchdog:
+    def __init__(self, motor, rate_hz=100, history=50, on_trip=None):
+        """
+        motor: Ordinary_Car (or anything with set_motor_model)
+        rate_hz: check frequency; a check is a few attribute reads per channel
+        history: number of stall records kept in memory
+        on_trip(record): optional callback (e.g. log_jsonl), called after the motors are stopped
+        """
+        self.motor = motor
+        self.period = 1.0 / rate_hz
+        self.on_trip = on_trip
+        self._channels = {}
+        self._running = False
+        self._thread = None
+        self.stalls = deque(maxlen=history)
+        self.trips = 0
+        self.ticks = 0
+        self.max_lateness = 0.0
+
+    def register(self, name, timeout, armed=None, thread_id=None):
+        """
+        Add a channel that must be fed at least every `timeout` seconds.
+        armed(): only enforce while it returns True (e.g. only while driving).
+        thread_id: thread whose stack is captured on a stall (default: caller).
+        """
+        self._channels[name] = _Channel(name, timeout, armed,
+                                        thread_id if thread_id is not None else threading.get_ident())
+
+    def feed(self, name):
+        """Mark channel `name` alive. Cheap enough for every loop tick."""
+        ch = self._channels[name]
+        ch.last = time.monotonic()
+        if ch.tripped_at is not None:
+            self._recovered(ch)
+
+    # --- lifecycle ---
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        while self._running:
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # The watchdog itself was starved (GIL, CPU); note it and resync
+                self.max_lateness = max(self.max_lateness, -delay)
+                next_tick = time.monotonic()
+            self.ticks += 1
+            now = time.monotonic()
+            for ch in tuple(self._channels.values()):
+                if ch.tripped_at is not None or now - ch.last <= ch.timeout:
+                    continue
+                try:
+                    if ch.armed is not None and not ch.armed():
+                        continue
+                except Exception as e:
+                    # Fail safe: a broken predicate counts as armed
+                    print(f"[WATCHDOG] '{ch.name}' armed() failed, treating as armed: {e!r}")
+                self._trip(ch, now)
+
+    def _trip(self, ch, now):
+        try:
+            self.motor.set_motor_model(0, 0, 0, 0)
+        except Exception as e:
+            print("[WATCHDOG] Motor stop failed:", e)
+        ch.tripped_at = now
+        self.trips += 1
+        frame = sys._current_frames().get(ch.thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else None
+        record = {
+            "event": "watchdog_trip",
+            "channel": ch.name,
+            "silent_for": round(now - ch.last, 3),
+            "timeout": ch.timeout,
+            "stack": stack,
+            "duration": None,
+        }
+        self.stalls.append(record)
+        print(f"[WATCHDOG] '{ch.name}' silent for {record['silent_for']}s — motors stopped")
+        if stack:
+            print(stack.rstrip())
+        if self.on_trip:
+            try:
+                self.on_trip(dict(record))
+            except Exception as e:
+                print("[WATCHDOG] on_trip error:", e)
+
+    def _recovered(self, ch):
+        duration = ch.last - ch.tripped_at
+        ch.tripped_at = None
+        for record in reversed(self.stalls):
+            if record["channel"] == ch.name and record["duration"] is None:
+                # Total stall: silence before the trip plus time until the next feed
+                record["duration"] = round(record["silent_for"] + duration, 3)
+                print(f"[WATCHDOG] '{ch.name}' recovered after {record['duration']}s")
+                break
+
+    def tripped(self):
+        """Names of channels currently in a tripped state."""
+        return [ch.name for ch in self._channels.values() if ch.tripped_at is not None]
+
+    def snapshot(self):
+        return {
+            "trips": self.trips,
+            "tripped": self.tripped(),
+            "max_lateness_ms": round(self.max_lateness * 1000, 2),
+            "last_stall": {k: v for k, v in self.stalls[-1].items() if k != "stack"} if self.stalls else None,
+        }
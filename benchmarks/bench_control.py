@@ -0,0 +1,133 @@
+# bench_control.py — Control loop tick rate/jitter and sensor read latency
+import statistics
+import time
+
+from common import percentile, quiet, summarize_ns, time_calls
+
+import log
+import maneuvers
+from adc import ADC
+from battery import BatteryMonitor
+from infrared import Infrared
+from motor import Ordinary_Car
+from ultrasonic import Ultrasonic
+from watchdog import SafetyWatchdog
+
+# main.py sleeps this long after each infrared_ultrasonic step
+LOOP_SLEEP = 0.05
+
+
+class _Rig:
+    """The simulated parts main.py's infrared_ultrasonic loop touches."""
+
+    def __init__(self):
+        with quiet():
+            self.sonic = Ultrasonic(simulate=True)
+            self.infrared = Infrared(simulate=True)
+            self.motor = Ordinary_Car(simulate=True)
+            self.adc = ADC(simulate=True)
+        self.battery = BatteryMonitor(self.adc)
+        self.motor.compensation = self.battery
+        self.maneuvers = maneuvers.ManeuverRunner(self.motor)
+        self.watchdog = SafetyWatchdog(self.motor)
+        self.watchdog.register("loop", 0.5)
+        self.sensor_log = log.get_logger("sensors").throttle(interval=1.0)
+
+    def start(self):
+        self.battery.start()
+        self.watchdog.start()
+
+    def stop(self):
+        self.watchdog.stop()
+        self.battery.stop()
+        self.maneuvers.stop()
+
+    def tick(self, avoid=True):
+        """
+        One pass of the infrared_ultrasonic branch of main.main(). With
+        avoid=False obstacles only stop the wheels instead of starting the
+        0.8 s reverse maneuver, so every call measures a full sensing step.
+        """
+        self.watchdog.feed("loop")
+        if self.maneuvers.tick():
+            return
+        distance = self.sonic.get_distance()
+        ir_bits = self.infrared.read_all_infrared()
+        left = (ir_bits >> 2) & 1
+        mid = (ir_bits >> 1) & 1
+        right = ir_bits & 1
+        self.sensor_log.info("reading", left=left, mid=mid, right=right, distance=distance)
+        if distance is not None and distance < 20:
+            self.motor.set_motor_model(0, 0, 0, 0)
+            if avoid:
+                self.maneuvers.start(
+                    maneuvers.sequence(self.motor, [((-500, -500, -500, -500), 0.8)]), "avoid_reverse")
+            return
+        if mid == 1 and left == 0 and right == 0:
+            self.motor.set_motor_model(700, 700, 700, 700)
+        elif left == 1 and mid == 0:
+            self.motor.set_motor_model(400, 400, 700, 700)
+        elif right == 1 and mid == 0:
+            self.motor.set_motor_model(700, 700, 400, 400)
+        elif left == 1 and mid == 1:
+            self.motor.set_motor_model(600, 600, 700, 700)
+        elif right == 1 and mid == 1:
+            self.motor.set_motor_model(700, 700, 600, 600)
+        else:
+            self.motor.set_motor_model(300, 300, 300, 300)
+
+
+def bench_loop(quick):
+    """Raw tick cost (no sleep) and the paced 20 Hz loop's achieved rate and jitter."""
+    rig = _Rig()
+    rig.start()
+    try:
+        samples = time_calls(lambda: rig.tick(avoid=False), 2000 if quick else 20000)
+        out = summarize_ns(samples, "tick")
+        out["tick_unpaced_per_s"] = round(1e9 / (sum(samples) / len(samples)))
+
+        duration = 2.0 if quick else 10.0
+        periods = []
+        last = time.perf_counter()
+        end = last + duration
+        while last < end:
+            rig.tick()
+            time.sleep(LOOP_SLEEP)
+            now = time.perf_counter()
+            periods.append(now - last)
+            last = now
+    finally:
+        rig.stop()
+
+    periods.sort()
+    deviation = sorted(abs(p - LOOP_SLEEP) for p in periods)
+    out.update({
+        "paced_rate_hz": round(len(periods) / sum(periods), 2),
+        "paced_period_p50_ms": round(percentile(periods, 0.5) * 1000, 3),
+        "paced_jitter_stdev_ms": round(statistics.pstdev(periods) * 1000, 3),
+        "paced_jitter_p99_ms": round(percentile(deviation, 0.99) * 1000, 3),
+        "paced_period_max_ms": round(periods[-1] * 1000, 3),
+    })
+    return out
+
+
+def bench_sensors(quick):
+    """Per-call latency of the simulated sensor, ADC and motor paths (metrics wrappers included)."""
+    with quiet():
+        sonic = Ultrasonic(simulate=True)
+        infrared = Infrared(simulate=True)
+        adc = ADC(simulate=True)
+        motor = Ordinary_Car(simulate=True)
+    n = 5000 if quick else 50000
+    out = {}
+    out.update(summarize_ns(time_calls(sonic.get_distance, n), "ultrasonic"))
+    out.update(summarize_ns(time_calls(infrared.read_all_infrared, n), "infrared"))
+    out.update(summarize_ns(time_calls(lambda: adc.read_adc(2), n), "adc"))
+    out.update(summarize_ns(time_calls(lambda: motor.set_motor_model(700, 700, 400, 400), n), "motor_write"))
+    return out
+
+
+BENCHMARKS = [
+    ("loop", bench_loop),
+    ("sensors", bench_sensors),
+]
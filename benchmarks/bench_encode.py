@@ -0,0 +1,99 @@
+# bench_encode.py — LED frame encoding and telemetry record encoding
+import json
+import sys
+from types import ModuleType, SimpleNamespace
+
+from common import Skip, quiet, summarize_ns, time_calls
+
+from metrics import REGISTRY as metrics
+
+STRIP_LENGTHS = (8, 64, 144, 300)
+
+
+class _NoSpiDev:
+    """spidev.SpiDev stand-in whose open() fails like a Pi with SPI disabled."""
+
+    def open(self, bus, device):
+        raise OSError(f"no /dev/spidev{bus}.{device} (benchmark stub)")
+
+
+def _ensure_spidev():
+    """Install a stub spidev module when the real one is missing, so the encoding runs anywhere."""
+    try:
+        import spidev  # noqa: F401
+    except ImportError:
+        stub = ModuleType("spidev")
+        stub.SpiDev = _NoSpiDev
+        sys.modules["spidev"] = stub
+
+
+def bench_leds(quick):
+    """
+    Freenove_SPI_LedPixel.show() for several strip lengths, both encodings
+    (mode 1: 8 SPI bytes per colour byte, mode 2: 4). Without an SPI device
+    the driver encodes the frame and skips the transfer, which is the part
+    that costs CPU on the car. Off the Pi, spidev is stubbed; numpy is
+    still required (backend/requirements.txt).
+    """
+    _ensure_spidev()
+    try:
+        with quiet():
+            from spi_ledpixel import Freenove_SPI_LedPixel
+    except ImportError as e:
+        raise Skip(f"LED driver dependencies missing ({e})")
+
+    n = 200 if quick else 2000
+    out = {}
+    for count in STRIP_LENGTHS:
+        with quiet():
+            strip = Freenove_SPI_LedPixel(count, 255)
+        if strip.check_spi_state():
+            # A real strip is attached: timings include the SPI transfer
+            out["spi_transfer"] = True
+        for i in range(count):
+            strip.set_led_rgb_data(i, strip.wheel((i * 256 // count) & 255))
+        out.update(summarize_ns(time_calls(lambda: strip.show(1), n, warmup=10), f"show8_{count}"))
+        out.update(summarize_ns(time_calls(lambda: strip.show(2), n, warmup=10), f"show4_{count}"))
+        if strip.check_spi_state():
+            strip.led_close()
+    return out
+
+
+def bench_telemetry(quick):
+    """Build the periodic telemetry record like main.py does, then JSON-encode it."""
+    from adc import ADC
+    from battery import BatteryMonitor
+    from infrared import Infrared
+    from motor import Ordinary_Car
+    from telemetry import collect_telemetry
+    from ultrasonic import Ultrasonic
+    from watchdog import SafetyWatchdog
+
+    with quiet():
+        adc = ADC(simulate=True)
+        car = SimpleNamespace(simulate=True, adc=adc, sonic=Ultrasonic(simulate=True),
+                              infrared=Infrared(simulate=True), motor=Ordinary_Car(simulate=True),
+                              battery=BatteryMonitor(adc))
+    car.battery.sample()
+    watchdog = SafetyWatchdog(car.motor)
+    watchdog.register("loop", 0.5)
+
+    def build():
+        telem = collect_telemetry(car, "infrared_ultrasonic", "bench", True)
+        telem["watchdog"] = watchdog.snapshot()
+        if metrics.enabled:
+            telem["metrics"] = metrics.snapshot()
+        return telem
+
+    n = 2000 if quick else 20000
+    out = summarize_ns(time_calls(build, n), "collect")
+    record = build()
+    out.update(summarize_ns(time_calls(lambda: json.dumps(record), n), "json_encode"))
+    out["record_bytes"] = len(json.dumps(record))
+    return out
+
+
+BENCHMARKS = [
+    ("leds", bench_leds),
+    ("telemetry", bench_telemetry),
+]
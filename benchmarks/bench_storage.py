@@ -0,0 +1,116 @@
+# bench_storage.py — LocalDB insert throughput and CloudSync drain rate
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import Skip, summarize_ns
+
+from localdb import LocalDB
+
+# Rows written by the drain benchmark carry this car_id and are deleted afterwards
+BENCH_CAR_ID = "bench"
+
+
+def _rows(n, car_id=BENCH_CAR_ID):
+    start = datetime.utcnow() - timedelta(seconds=n)
+    for i in range(n):
+        yield {
+            "ts": (start + timedelta(seconds=i)).isoformat() + "Z",
+            "car_id": car_id,
+            "mode": "infrared_ultrasonic",
+            "ir": i % 8,
+            "distance": 10.0 + (i % 90),
+            "battery": 7.4,
+            "motor": (700, 700, 400, 400),
+        }
+
+
+def bench_localdb(quick):
+    """insert_telemetry throughput, plus the get_unsynced/mark_synced cycle CloudSync runs."""
+    n = 500 if quick else 5000
+    tmp = tempfile.mkdtemp(prefix="smartcar-bench-")
+    try:
+        db = LocalDB(os.path.join(tmp, "bench.db"))
+        samples = []
+        clock = time.perf_counter_ns
+        for row in _rows(n):
+            t0 = clock()
+            db.insert_telemetry(row)
+            samples.append(clock() - t0)
+        out = summarize_ns(samples, "insert")
+        out["insert_rows_per_s"] = round(n / (sum(samples) / 1e9))
+
+        drained = 0
+        t0 = time.perf_counter()
+        while True:
+            batch = db.get_unsynced(limit=200)
+            if not batch:
+                break
+            db.mark_synced([r["id"] for r in batch])
+            drained += len(batch)
+        out["local_drain_rows_per_s"] = round(drained / (time.perf_counter() - t0))
+        return out
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_cloudsync(quick):
+    """
+    CloudSync.sync_once drain rate into a local Postgres.
+    Set BENCH_PG_URL to a scratch database, e.g.
+    postgresql://postgres@localhost/smartcar_bench?sslmode=disable
+    (the schema is migrated there; benchmark rows are removed afterwards).
+    """
+    url = os.getenv("BENCH_PG_URL")
+    if not url:
+        raise Skip("BENCH_PG_URL not set")
+    try:
+        from sync_to_cloud import CloudSync, _connect
+        from cloud_schema import ROLLUP_TABLES
+    except ImportError as e:
+        raise Skip(f"psycopg2 not installed ({e})")
+
+    n = 1000 if quick else 5000
+    tmp = tempfile.mkdtemp(prefix="smartcar-bench-")
+    try:
+        db = LocalDB(os.path.join(tmp, "bench.db"))
+        sync = CloudSync(url, db, car_id=BENCH_CAR_ID)
+        # Warm-up batch runs the migrations and creates partitions
+        for row in _rows(1):
+            db.insert_telemetry(row)
+        sync.sync_once()
+
+        for row in _rows(n):
+            db.insert_telemetry(row)
+        batches = []
+        clock = time.perf_counter_ns
+        synced = 0
+        while True:
+            t0 = clock()
+            count = sync.sync_once()
+            if not count:
+                break
+            batches.append(clock() - t0)
+            synced += count
+        out = summarize_ns(batches, "batch")
+        out["cloud_drain_rows_per_s"] = round(synced / (sum(batches) / 1e9))
+        return out
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            conn = _connect(url)
+            with conn.cursor() as cur:
+                for table in ("telemetry", *ROLLUP_TABLES.values()):
+                    cur.execute(f"DELETE FROM {table} WHERE car_id = %s", (BENCH_CAR_ID,))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print("[BENCH] cleanup failed:", e)
+
+
+BENCHMARKS = [
+    ("localdb", bench_localdb),
+    ("cloudsync", bench_cloudsync),
+]
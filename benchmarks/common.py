@@ -0,0 +1,61 @@
+# common.py — Shared helpers for the benchmark suite
+#
+# Benchmarks import the backend modules the same way main.py does (flat
+# imports from backend/), always in simulate mode, so they run on any Linux
+# box with backend/requirements.txt installed.
+import contextlib
+import io
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+class Skip(Exception):
+    """Raised by a benchmark whose prerequisites (driver, database) are missing."""
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def time_calls(fn, n, warmup=100):
+    """Call fn() n times; returns per-call durations in nanoseconds."""
+    for _ in range(min(warmup, n)):
+        fn()
+    clock = time.perf_counter_ns
+    samples = []
+    append = samples.append
+    for _ in range(n):
+        t0 = clock()
+        fn()
+        append(clock() - t0)
+    return samples
+
+
+def summarize_ns(samples, prefix):
+    """{prefix_p50_us, prefix_p99_us, prefix_mean_us} from nanosecond samples."""
+    s = sorted(samples)
+    return {
+        f"{prefix}_p50_us": round(percentile(s, 0.5) / 1000, 2),
+        f"{prefix}_p99_us": round(percentile(s, 0.99) / 1000, 2),
+        f"{prefix}_mean_us": round(sum(s) / len(s) / 1000, 2),
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow driver chatter (simulation banners, SPI hints) during setup."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def higher_is_better(metric):
+    """Throughput-style metrics end in _per_s or _hz; everything else is a cost."""
+    return metric.endswith(("_per_s", "_hz"))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# run.py — Run the backend benchmarks and compare against a stored baseline
+#
+#   python benchmarks/run.py                     # all benchmarks, compare with baseline.json
+#   python benchmarks/run.py loop sensors --quick
+#   python benchmarks/run.py --save-baseline     # record this machine's numbers
+#   python benchmarks/run.py --out results.json  # also write the JSON report to a file
+#
+# The human-readable table goes to stderr and the JSON report to stdout (or
+# --out). Exit status is 1 when a metric regressed past --threshold.
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import traceback
+from datetime import datetime, timezone
+
+from common import Skip, higher_is_better, quiet
+
+# Driver modules print their simulation banners on import; keep stdout for the report
+with quiet():
+    import log
+    from metrics import REGISTRY as metrics
+
+    import bench_control
+    import bench_encode
+    import bench_storage
+
+BENCHMARKS = dict(bench_control.BENCHMARKS + bench_storage.BENCHMARKS + bench_encode.BENCHMARKS)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def run(names, quick):
+    results = {}
+    for name in names:
+        print(f"[BENCH] {name} ...", file=sys.stderr, flush=True)
+        t0 = time.perf_counter()
+        try:
+            results[name] = BENCHMARKS[name](quick)
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+        except Exception as e:
+            traceback.print_exc()
+            results[name] = {"error": str(e)}
+        print(f"[BENCH] {name} done in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Rows of (bench, metric, base, now, change, regressed); change > 0 is always worse."""
+    rows = []
+    for name, metrics_now in results.items():
+        base = baseline.get("results", {}).get(name, {})
+        for metric, now in metrics_now.items():
+            old = base.get(metric)
+            if isinstance(now, bool) or not isinstance(now, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            if not old:
+                continue
+            change = (now - old) / old
+            if higher_is_better(metric):
+                change = -change
+            rows.append((name, metric, old, now, change, change > threshold))
+    return rows
+
+
+def print_results(results, rows):
+    by_key = {(r[0], r[1]): r for r in rows}
+    for name, values in results.items():
+        print(f"\n{name}", file=sys.stderr)
+        for metric, value in values.items():
+            line = f"  {metric:<32} {value}"
+            row = by_key.get((name, metric))
+            if row:
+                line += f"   (baseline {row[2]}, {row[4]:+.0%} {'REGRESSED' if row[5] else 'ok'})"
+            print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart Car backend benchmarks (simulate mode)")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help="benchmarks to run (default: all): " + ", ".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a smoke run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown counted as a regression (default 0.25 = 25%%)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmark(s): " + ", ".join(unknown))
+
+    # Logging as in main.py, but to /dev/null so the loop pays the real cost quietly
+    devnull = open(os.devnull, "w")
+    log.setup(stream=devnull)
+
+    names = args.names or list(BENCHMARKS)
+    report = {
+        "meta": {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "metrics_enabled": metrics.enabled,
+        },
+        "results": run(names, args.quick),
+    }
+    log.shutdown()
+
+    rows = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report["results"], baseline, args.threshold)
+        report["baseline"] = {"path": args.baseline, "time": baseline.get("meta", {}).get("time"),
+                              "regressions": [f"{r[0]}.{r[1]}" for r in rows if r[5]]}
+    print_results(report["results"], rows)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"\n[BENCH] Baseline saved to {args.baseline}", file=sys.stderr)
+
+    regressions = [r for r in rows if r[5]]
+    if regressions:
+        print(f"\n[BENCH] {len(regressions)} metric(s) regressed more than {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+AIO_API = "https://io.adafruit.com/api/v2"
+# Worth retrying: throttled or upstream trouble
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def not_delivered(error):
+    """True when a failed request provably never reached the server, so re-sending a POST is safe."""
+    return isinstance(error, requests.exceptions.ConnectTimeout)
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _OpStats:
+    def __init__(self, window):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self):
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "latency_ms": {
+                "avg": round(sum(lat) / len(lat) * 1000, 1) if lat else None,
+                "p50": pct(50), "p95": pct(95), "max": pct(100),
+            },
+        }
+
+
+class AdafruitIO:
+    def __init__(self, username, key, timeout=4, retries=2, backoff=0.25, max_backoff=2.0,
+                 pool_size=10, latency_window=500):
+        """
+        Shared Adafruit IO REST client.
+
+        One requests.Session keeps TLS connections to io.adafruit.com alive
+        (pool_size per host), so calls after the first skip DNS/TCP/TLS setup.
+        Throttled (429) and 5xx responses are retried up to `retries` times
+        with full-jitter exponential backoff. A POST that timed out or lost its
+        connection is not retried, since the command may already have been
+        delivered. Concurrent get_last() calls for the same feed share one
+        in-flight request.
+        """
+        self.username = username
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.session.headers.update({"X-AIO-Key": key or "", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {}
+        self._latency_window = latency_window
+        self._executor = None
+
+    def _op(self, name):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _OpStats(self._latency_window)
+            return stats
+
+    def _url(self, feed, suffix):
+        return f"{AIO_API}/{self.username}/feeds/{feed}/{suffix}"
+
+    def _sleep_backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            delay = min(retry_after, self.max_backoff)
+        else:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        time.sleep(delay)
+
+    def _request(self, op, method, url, idempotent, **kwargs):
+        stats = self._op(op)
+        t0 = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                last = attempt == self.retries
+                try:
+                    r = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                except requests.exceptions.ConnectTimeout:
+                    # Never reached the server: safe to retry anything
+                    if last:
+                        raise
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    # The request may have been processed
+                    if last or not idempotent:
+                        raise
+                else:
+                    if r.status_code not in RETRY_STATUSES or last:
+                        r.raise_for_status()
+                        return r
+                    retry_after = r.headers.get("Retry-After")
+                    with self._lock:
+                        stats.retries += 1
+                    self._sleep_backoff(attempt, float(retry_after) if retry_after and retry_after.isdigit() else None)
+                    continue
+                with self._lock:
+                    stats.retries += 1
+                self._sleep_backoff(attempt)
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                stats.calls += 1
+                stats.latencies.append(time.perf_counter() - t0)
+
+    # --- blocking API ---
+    def get_last(self, feed):
+        """Last value of `feed`, JSON-decoded when it is a JSON string; None if the feed is empty."""
+        stats = self._op("get")
+        with self._lock:
+            call = self._inflight.get(feed)
+            leader = call is None
+            if leader:
+                call = self._inflight[feed] = _InFlight()
+            else:
+                stats.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            r = self._request("get", "GET", self._url(feed, "data/last"), idempotent=True)
+            value = r.json().get("value")
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            call.result = value
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(feed, None)
+            call.done.set()
+
+    def send(self, feed, value):
+        """Publish {"value": value} to `feed`."""
+        self._request("send", "POST", self._url(feed, "data"), idempotent=False, json={"value": value})
+        return True
+
+    # --- asyncio API (same calls on a small thread pool, sharing the session) ---
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="aio")
+            return self._executor
+
+    async def get_last_async(self, feed):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), self.get_last, feed)
+
+    async def send_async(self, feed, value):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), self.send, feed, value)
+
+    def stats(self):
+        with self._lock:
+            return {op: s.snapshot() for op, s in self._stats.items()}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.session.close()
@@ -1,9 +1,20 @@
 import os
-import json
-import requests
+import datetime
+import threading
+import time
 import psycopg
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory
 from dotenv import load_dotenv
+from image_index import ImageIndex
+from thumbnails import ThumbnailCache
+from telemetry_cache import TelemetryCache, car_of
+from live_stream import LiveBroadcaster
+from response_cache import ResponseCache
+from aio_client import AdafruitIO, not_delivered
+from command_queue import CommandDispatcher, REJECTED
+from database.db import get_pool, pool_stats, DB_PREPARE
+from database.telemetry_schema import TelemetrySchema
+from serving import WEB_RESERVED_THREADS, WEB_THREADS
 
 load_dotenv()
 
@@ -15,10 +26,8 @@ app = Flask(__name__)
 AIO_USERNAME = os.getenv("AIO_USERNAME")
 AIO_KEY = os.getenv("AIO_KEY")
 
-HEADERS = {
-    "X-AIO-Key": AIO_KEY,
-    "Content-Type": "application/json"
-}
+# One keep-alive session to io.adafruit.com shared by every request thread
+aio = AdafruitIO(AIO_USERNAME, AIO_KEY)
 
 # Telemetry feed
 FEED_TELEMETRY = os.getenv("AIO_FEED_TELEMETRY", "smartcar-telemetry")
@@ -26,29 +35,73 @@ FEED_TELEMETRY = os.getenv("AIO_FEED_TELEMETRY", "smartcar-telemetry")
 # Command feed
 FEED_COMMANDS = os.getenv("AIO_CMD_COMMANDS", "smartcar-commands")
 
-# Database credentials
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = int(os.getenv("DB_PORT", 5432))
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASS")
+# Dashboard command publishes per minute (Adafruit IO free tier: 30 for the whole
+# account, shared with telemetry) and how long movement clicks are coalesced
+CONTROL_RATE_PER_MIN = float(os.getenv("CONTROL_RATE_PER_MIN", 20))
+CONTROL_BURST = int(os.getenv("CONTROL_BURST", 3))
+CONTROL_DEBOUNCE = float(os.getenv("CONTROL_DEBOUNCE", 0.15))
+
+# Each open live stream holds one gthread thread for as long as it is connected;
+# past this many per worker, new streams get 503 so other routes keep threads
+LIVE_MAX_CLIENTS = int(os.getenv("LIVE_MAX_CLIENTS", max(1, WEB_THREADS - WEB_RESERVED_THREADS)))
+
+# Telemetry older than this is refreshed over REST (backend publishes every 10 s)
+TELEMETRY_STALE_SECONDS = float(os.getenv("TELEMETRY_STALE_SECONDS", 30))
 
 # Image storage directory (for local development/testing)
 CAPTURE_DIR = os.path.join(os.path.dirname(__file__), "static", "captures")
 os.makedirs(CAPTURE_DIR, exist_ok=True)
+image_index = ImageIndex(CAPTURE_DIR)
 
+# On-disk thumbnail cache
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+thumbnails = ThumbnailCache(CAPTURE_DIR, os.path.join(CACHE_DIR, "thumbs"))
 
-# -------------------------------------------
-# DATABASE CONNECTION
-# -------------------------------------------
-def get_db_connection():
-    return psycopg.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS
-    )
+# Captures are never rewritten under the same name, so let browsers keep them
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+# History downsampling: bucket widths are rounded up to one of these (seconds)
+HISTORY_DEFAULT_POINTS = 500
+HISTORY_MAX_POINTS = 5000
+BUCKET_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600,
+                7200, 10800, 21600, 43200, 86400, 172800, 604800)
+
+# Gallery pagination
+IMAGES_PAGE_SIZE = 50
+IMAGES_MAX_PAGE_SIZE = 500
+
+# API response cache. Set RESPONSE_CACHE_DISK=1 to share it between gunicorn workers.
+RESPONSE_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", 256))
+RESPONSE_CACHE_DISK = os.getenv("RESPONSE_CACHE_DISK", "0") in ("1", "true", "yes")
+# Ranges still receiving data (today, or a car that was offline and syncs late)
+HISTORY_OPEN_TTL = float(os.getenv("HISTORY_OPEN_TTL", 30))
+# A range that ended this long ago is treated as closed and cached until invalidated
+HISTORY_SETTLE_SECONDS = float(os.getenv("HISTORY_SETTLE_SECONDS", 6 * 3600))
+IMAGES_CACHE_TTL = float(os.getenv("IMAGES_CACHE_TTL", 5))
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_ENTRIES,
+    disk_dir=os.path.join(CACHE_DIR, "responses") if RESPONSE_CACHE_DISK else None
+)
+# A new capture makes every cached image listing stale (the index is checked
+# ahead of every /api/images lookup, so this also fires on cache hits)
+image_index.add_listener(lambda: response_cache.invalidate("images"))
+
+
+# Telemetry column mapping, resolved once and reused by /api/history
+telemetry_schema = TelemetrySchema()
+
+
+def _warm_telemetry_schema():
+    try:
+        with get_pool().connection() as conn:
+            telemetry_schema.ensure(conn)
+    except Exception as e:
+        print("DB SCHEMA WARMUP ERROR:", e)
+
+
+# Resolve at startup without holding up the import if the database is slow
+threading.Thread(target=_warm_telemetry_schema, daemon=True).start()
 
 
 # -------------------------------------------
@@ -56,15 +109,10 @@ def get_db_connection():
 # -------------------------------------------
 def aio_get(feed, key=None):
     """Get last value from Adafruit IO feed. Parse JSON if necessary."""
-    url = f"https://io.adafruit.com/api/v2/{AIO_USERNAME}/feeds/{feed}/data/last"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=4)
-        data = r.json().get("value")
+        data = aio.get_last(feed)
         if data is None:
             return "N/A"
-        # Parse JSON if feed value is JSON string
-        if isinstance(data, str):
-            data = json.loads(data)
         return data[key] if key else data
     except Exception as e:
         print("AIO GET ERROR:", e)
@@ -73,18 +121,90 @@ def aio_get(feed, key=None):
 
 def aio_send(feed, value):
     """Send command to Adafruit IO."""
-    url = f"https://io.adafruit.com/api/v2/{AIO_USERNAME}/feeds/{feed}/data"
-    # Always send {"value": ...} for Adafruit IO feeds
-    data = {"value": value}
     try:
-        requests.post(url, headers=HEADERS, json=data, timeout=4)
-        return True
+        # Always sent as {"value": ...} for Adafruit IO feeds
+        return aio.send(feed, value)
     except Exception as e:
         print("AIO SEND ERROR:", e)
         return False
 
 
 
+# Coalesces/batches dashboard commands and keeps them under the feed quota.
+# The token bucket is a file in CACHE_DIR, so all gunicorn workers share it.
+# Publish errors reach the dispatcher, which only re-sends commands that
+# never left this machine (a timed-out POST may already have been delivered).
+commands = CommandDispatcher(lambda message: aio.send(FEED_COMMANDS, message),
+                             rate_per_minute=CONTROL_RATE_PER_MIN,
+                             burst=CONTROL_BURST,
+                             debounce=CONTROL_DEBOUNCE,
+                             retryable=not_delivered,
+                             bucket_path=os.path.join(CACHE_DIR, "command-bucket.json"))
+commands.start()
+
+
+# -------------------------------------------
+# LIVE TELEMETRY CACHE
+# -------------------------------------------
+telemetry_cache = TelemetryCache(AIO_USERNAME, AIO_KEY, FEED_TELEMETRY)
+live_broadcaster = LiveBroadcaster(max_clients=LIVE_MAX_CLIENTS)
+
+
+# REST fallback results per requested car: {car_id: (fetched_at, value)}.
+# Misses are remembered too, so an offline or unknown car costs one Adafruit
+# IO call per stale window instead of one per request.
+_rest_fallback = {}
+_rest_fallback_lock = threading.Lock()
+
+
+def get_live_telemetry(car_id=None):
+    """
+    Latest telemetry dict for car_id (newest car when None) from the MQTT
+    cache, falling back to REST when stale.
+    """
+    telemetry = telemetry_cache.latest(car_id, max_age=TELEMETRY_STALE_SECONDS)
+    if telemetry is not None:
+        return telemetry
+    with _rest_fallback_lock:
+        cached = _rest_fallback.get(car_id)
+    if cached is not None and time.time() - cached[0] < TELEMETRY_STALE_SECONDS:
+        return cached[1]
+    telemetry = aio_get(FEED_TELEMETRY)
+    if (isinstance(telemetry, dict) and "event" in telemetry) or (car_id and car_of(telemetry) != car_id):
+        # The shared feed's last value is a one-off report (e.g. profiler
+        # results) or belongs to another car
+        telemetry = telemetry_cache.latest(car_id) or "N/A"
+    # Kept out of telemetry_cache: a REST value has no receive time of its
+    # own and must not reach the history or the live listeners
+    with _rest_fallback_lock:
+        _rest_fallback[car_id] = (time.time(), telemetry)
+    return telemetry
+
+
+def format_live(telemetry):
+    if not isinstance(telemetry, dict):
+        return {"ir": "N/A", "ultrasonic": "N/A", "speed": "N/A"}
+
+    return {
+        "car_id": car_of(telemetry),
+        "ir": telemetry.get("ir", "N/A"),
+        "ultrasonic": telemetry.get("distance", "N/A"),
+        "speed": (telemetry.get("motor") or [0])[0],  # first motor as example
+        "mode": telemetry.get("mode", "N/A"),
+        "battery": telemetry.get("battery", "N/A"),
+        "battery_scale": telemetry.get("battery_scale"),
+        "car_active": telemetry.get("car_active", False)
+    }
+
+
+# One upstream subscription feeds every connected browser
+telemetry_cache.add_listener(lambda car_id, received, value: live_broadcaster.publish(
+    dict(format_live(value), received=received), car_id=car_id))
+# New telemetry means CloudSync will soon add rows to open history ranges
+telemetry_cache.add_listener(lambda car_id, received, value: response_cache.invalidate("history-open"))
+telemetry_cache.start()
+
+
 # -------------------------------------------
 # ROUTES
 # -------------------------------------------
@@ -121,24 +241,72 @@ def obstacle_avoid():
 
 @app.route("/gallery")
 def gallery():
-    return render_template("gallery.html")
+    """Image gallery; ?limit= sets the page size (same bounds as /api/images)."""
+    try:
+        page_size = min(max(int(request.args.get("limit", IMAGES_PAGE_SIZE)), 1), IMAGES_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = IMAGES_PAGE_SIZE
+    return render_template("gallery.html", page_size=page_size)
 
 
 @app.route("/api/live")
 def api_live():
-    """Return latest telemetry data for dashboard."""
-    telemetry = aio_get(FEED_TELEMETRY)
-    if telemetry == "N/A":
-        return {"ir": "N/A", "ultrasonic": "N/A", "speed": "N/A"}
+    """Return latest telemetry data for dashboard (?car=<car_id>, default: newest car)."""
+    return format_live(get_live_telemetry(request.args.get("car")))
+
+
+@app.route("/api/fleet")
+def api_fleet():
+    """Overview of every car seen on the telemetry feed, most recently heard first."""
+    now = time.time()
+    cars = []
+    for car_id, (received, value) in telemetry_cache.cars().items():
+        # received 0: the feed's replayed last value, age unknown
+        cars.append(dict(format_live(value),
+                         age=round(now - received, 1) if received else None,
+                         online=bool(received) and now - received <= TELEMETRY_STALE_SECONDS))
+    cars.sort(key=lambda c: float("inf") if c["age"] is None else c["age"])
+    return jsonify({"count": len(cars), "cars": cars})
+
+
+@app.route("/api/live/stream")
+def api_live_stream():
+    """
+    Server-Sent Events stream of live telemetry.
+    Each open stream holds a worker thread, so run gunicorn with threads (gthread).
+    """
+    car_id = request.args.get("car")
+    initial = format_live(get_live_telemetry(car_id))
+    q = live_broadcaster.subscribe(car_id)
+    if q is None:
+        # The browser's EventSource retries; /api/live polling still works meanwhile
+        return {"error": "too many live clients"}, 503, {"Retry-After": "10"}
+    response = Response(live_broadcaster.stream(q, initial=initial), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/live/history")
+def api_live_history():
+    """Return the recent telemetry kept in memory (newest last)."""
+    car_id = request.args.get("car")
+    try:
+        limit = int(request.args.get("limit", 60))
+    except ValueError:
+        return {"error": "invalid limit"}, 400
+    return jsonify({
+        "connected": telemetry_cache.connected,
+        "age": telemetry_cache.age(car_id),
+        "items": [dict(format_live(v), received=ts) for ts, v in telemetry_cache.history(car_id, limit)]
+    })
 
-    return {
-        "ir": telemetry.get("ir", "N/A"),
-        "ultrasonic": telemetry.get("distance", "N/A"),
-        "speed": telemetry.get("motor", [0])[0],  # first motor as example
-        "mode": telemetry.get("mode", "N/A"),
-        "battery": telemetry.get("battery", "N/A"),
-        "car_active": telemetry.get("car_active", False)
-    }
+
+@app.route("/api/live/events")
+def api_live_events():
+    """One-off reports from the cars (e.g. profiler results), newest last."""
+    car_id = request.args.get("car")
+    return jsonify([dict(v, car_id=car, received=ts) for car, ts, v in telemetry_cache.recent_events(car_id)])
 
 
 @app.route("/api/control", methods=["POST"])
@@ -147,6 +315,7 @@ def api_control():
     data = request.json
     device = data.get("device")
     value = data.get("value")
+    car_id = data.get("car_id")
 
     # Map all device types to the command feed
     mapping = {
@@ -154,77 +323,96 @@ def api_control():
         "mode": FEED_COMMANDS,
         "buzzer": FEED_COMMANDS,
         "led": FEED_COMMANDS,      # LED control
-        "camera": FEED_COMMANDS     # Camera control
+        "camera": FEED_COMMANDS,    # Camera control
+        "drive": FEED_COMMANDS,     # Continuous drive vector
+        "profile": FEED_COMMANDS    # Sampling profiler window on the car
     }
 
     feed = mapping.get(device)
     if feed is None:
         return jsonify({"status": "error", "msg": "unknown device"}), 400
 
-    # Send the command value to Adafruit IO
-    # Backend will receive and process: take_photo, led_on, led_off, etc.
-    ok = aio_send(feed, value)
-    return jsonify({"status": "ok" if ok else "error"})
+    if device == "drive":
+        # value: [throttle, steering] or [vx, vy, omega], each in [-1, 1]
+        if not isinstance(value, list) or len(value) not in (2, 3) \
+                or not all(isinstance(v, (int, float)) for v in value):
+            return jsonify({"status": "error", "msg": "drive value must be 2 or 3 numbers"}), 400
+        value = {"drive": [round(max(-1.0, min(1.0, float(v))), 3) for v in value]}
+    elif device == "profile":
+        # value: window length in seconds (the car caps it at 300)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+            return jsonify({"status": "error", "msg": "profile value must be a positive number of seconds"}), 400
+        value = {"command": "profile"} if value is None else {"command": "profile", "seconds": value}
+
+    # Queued for the command feed; the backend processes take_photo, led_on, etc.
+    # Addressed commands are JSON so every car can ignore the others' commands
+    result = commands.submit(value, car_id or None)
+    if result["dispatch"] == REJECTED:
+        return jsonify({"status": "error", "msg": "too many pending commands", **result}), 429
+    return jsonify({"status": "ok", **result})
+
+
+@app.route("/api/control/status")
+def api_control_status():
+    """Command dispatcher counters, pending commands per car and rate-limit state."""
+    return jsonify(commands.stats())
+
+
+def _history_closed(args):
+    """True when the requested range ended long enough ago that no more rows will arrive."""
+    try:
+        _, end = _parse_range(args)
+    except (KeyError, ValueError):
+        return False
+    now = datetime.datetime.now(end.tzinfo)
+    return (now - end).total_seconds() > HISTORY_SETTLE_SECONDS
+
+
+def _history_ttl(args):
+    return None if _history_closed(args) else HISTORY_OPEN_TTL
+
+
+def _history_tags(args):
+    return ("history",) if _history_closed(args) else ("history", "history-open")
 
 
 @app.route("/api/history")
+@response_cache.cached(ttl=_history_ttl, tags=_history_tags)
 def history():
     """Return historical telemetry from database."""
     date = request.args.get("date")
+    car_id = request.args.get("car")
     if not date:
         return {"error": "missing date"}, 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # First, check if telemetry table exists and get its columns
-        cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'telemetry'
-            ORDER BY ordinal_position
-        """)
-        columns = [row[0] for row in cur.fetchall()]
-        
-        # If table doesn't exist or is empty, return empty data
-        if not columns:
-            cur.close()
-            conn.close()
-            return {
-                "timestamps": [],
-                "ir": [],
-                "ultrasonic": [],
-                "speed": []
-            }
-        
-        # Build query based on available columns
-        timestamp_col = next((col for col in columns if 'time' in col.lower()), 'id')
-        ir_col = next((col for col in columns if 'ir' in col.lower()), None)
-        ultrasonic_col = next((col for col in columns if 'ultrasonic' in col.lower() or 'distance' in col.lower()), None)
-        speed_col = next((col for col in columns if 'speed' in col.lower() or 'motor' in col.lower()), None)
-        
-        # Execute query with dynamic column names
-        if timestamp_col != 'id':
-            cur.execute(f"""
-                SELECT {timestamp_col}, {ir_col or 'NULL'}, {ultrasonic_col or 'NULL'}, {speed_col or 'NULL'}
-                FROM telemetry
-                WHERE DATE({timestamp_col}) = %s
-                ORDER BY {timestamp_col} ASC
-            """, (date,))
-        else:
-            # If no timestamp column, just get recent records
-            cur.execute(f"""
-                SELECT {timestamp_col}, {ir_col or 'NULL'}, {ultrasonic_col or 'NULL'}, {speed_col or 'NULL'}
-                FROM telemetry
-                ORDER BY {timestamp_col} DESC
-                LIMIT 100
-            """)
-        
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        
+        day = datetime.date.fromisoformat(date)
+    except ValueError:
+        return {"error": "invalid date, expected YYYY-MM-DD"}, 400
+
+    try:
+        with get_pool().connection() as conn:
+            telemetry_schema.ensure(conn)
+            query = telemetry_schema.query("day", car_id)
+            params = {"day": day, "car": car_id}
+            if query is None:
+                # No timestamp column: fall back to recent records
+                query = telemetry_schema.query("recent", car_id)
+                params = {"car": car_id} if car_id and telemetry_schema.has_car else None
+
+            # If table doesn't exist, return empty data
+            if query is None:
+                return {
+                    "timestamps": [],
+                    "ir": [],
+                    "ultrasonic": [],
+                    "speed": []
+                }
+
+            with conn.cursor() as cur:
+                cur.execute(query, params, prepare=DB_PREPARE)
+                rows = cur.fetchall()
+
         # Return empty arrays if no data found
         if not rows:
             return {
@@ -240,8 +428,21 @@ def history():
             "ultrasonic": [r[2] if r[2] is not None else 0 for r in rows],
             "speed": [r[3] if r[3] is not None else 0 for r in rows]
         }
+    except (psycopg.errors.UndefinedTable, psycopg.errors.UndefinedColumn) as e:
+        # Schema changed under us: re-resolve the columns on the next request
+        print("DB SCHEMA CHANGED:", e)
+        telemetry_schema.invalidate()
+        response_cache.bypass()
+        return {
+            "timestamps": [],
+            "ir": [],
+            "ultrasonic": [],
+            "speed": [],
+            "error": str(e)
+        }
     except Exception as e:
         print("DB ERROR:", e)
+        response_cache.bypass()
         # Return empty data instead of error to prevent frontend issues
         return {
             "timestamps": [],
@@ -252,40 +453,188 @@ def history():
         }
 
 
+def _parse_range(args):
+    """(start, end) from ?date=YYYY-MM-DD or ?start=&end= ISO timestamps."""
+    if args.get("date"):
+        day = datetime.date.fromisoformat(args["date"])
+        return (datetime.datetime.combine(day, datetime.time.min),
+                datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+    start = datetime.datetime.fromisoformat(args["start"])
+    end = datetime.datetime.fromisoformat(args["end"]) if args.get("end") else datetime.datetime.now(start.tzinfo)
+    if end <= start:
+        raise ValueError("end must be after start")
+    return start, end
+
+
+def _bucket_seconds(start, end, points):
+    span = (end - start).total_seconds() / points
+    return next((step for step in BUCKET_STEPS if step >= span), BUCKET_STEPS[-1])
+
+
+@app.route("/api/history/series")
+@response_cache.cached(ttl=_history_ttl, tags=_history_tags)
+def history_series():
+    """
+    Downsampled telemetry for charts.
+    Query params: date=YYYY-MM-DD or start=&end= (ISO), points=target bucket count,
+    car=<car_id> (all cars when omitted).
+    Returns one array per column: bucket start (epoch s), sample count,
+    and min/max/avg for each series, plus the table they were read from.
+    """
+    try:
+        start, end = _parse_range(request.args)
+        points = min(max(int(request.args.get("points", HISTORY_DEFAULT_POINTS)), 1), HISTORY_MAX_POINTS)
+    except (KeyError, ValueError) as e:
+        return {"error": f"invalid range: {e}"}, 400
+
+    bucket = _bucket_seconds(start, end, points)
+    series = ("ir", "ultrasonic", "speed")
+    payload = {"bucket_seconds": bucket, "t": [], "count": []}
+    for name in series:
+        payload[name] = {"min": [], "max": [], "avg": []}
+
+    try:
+        with get_pool().connection() as conn:
+            telemetry_schema.ensure(conn)
+            # Minute-or-coarser buckets are summed from the rollup tables
+            query, payload["source"] = telemetry_schema.series_query(bucket, request.args.get("car"))
+            if query is None:
+                return payload
+            with conn.cursor() as cur:
+                cur.execute(query, {"bucket": datetime.timedelta(seconds=bucket), "start": start, "end": end,
+                                    "car": request.args.get("car")},
+                            prepare=DB_PREPARE)
+                rows = cur.fetchall()
+    except (psycopg.errors.UndefinedTable, psycopg.errors.UndefinedColumn) as e:
+        print("DB SCHEMA CHANGED:", e)
+        telemetry_schema.invalidate()
+        response_cache.bypass()
+        return dict(payload, error=str(e))
+    except Exception as e:
+        print("DB ERROR:", e)
+        response_cache.bypass()
+        return dict(payload, error=str(e))
+
+    payload["t"] = [r[0] for r in rows]
+    payload["count"] = [r[1] for r in rows]
+    for i, name in enumerate(series):
+        col = 2 + i * 3
+        payload[name]["min"] = [r[col] for r in rows]
+        payload[name]["max"] = [r[col + 1] for r in rows]
+        payload[name]["avg"] = [None if r[col + 2] is None else round(r[col + 2], 2) for r in rows]
+    return payload
+
+
+@app.route("/api/history/schema", methods=["GET", "POST"])
+def history_schema():
+    """Show the cached telemetry column mapping; POST re-reads it from the database."""
+    try:
+        if request.method == "POST" or telemetry_schema.mapping is None:
+            with get_pool().connection() as conn:
+                telemetry_schema.refresh(conn)
+            if request.method == "POST":
+                response_cache.invalidate("history")
+        return jsonify({"table": telemetry_schema.table, "columns": telemetry_schema.mapping})
+    except Exception as e:
+        print("DB ERROR:", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/db/pool")
+def api_db_pool():
+    """Connection pool metrics."""
+    return jsonify(pool_stats())
+
+
+@app.route("/api/aio")
+def api_aio():
+    """Adafruit IO client metrics (calls, retries, coalesced reads, latency)."""
+    return jsonify(aio.stats())
+
+
+@app.route("/api/cache")
+def api_cache():
+    """Response cache hit/miss metrics."""
+    return jsonify(response_cache.stats())
+
+
+@app.route("/api/cache/invalidate", methods=["POST"])
+def api_cache_invalidate():
+    """
+    Drop cached responses. Body: {"tags": ["history", "images"]}; no tags drops everything.
+    Use after backfilling old telemetry or deleting captures.
+    """
+    tags = (request.get_json(silent=True) or {}).get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    response_cache.invalidate(*tags)
+    return jsonify({"status": "ok", "invalidated": tags or "all"})
+
+
+def _send_cached(response, st, variant):
+    """Attach a strong validator and long-lived caching headers to an image response."""
+    response.set_etag(f"{st.st_mtime_ns:x}-{st.st_size:x}-{variant}")
+    response.last_modified = int(st.st_mtime)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    # Re-evaluate with the new validators: answers 304 / 206 as appropriate
+    return response.make_conditional(request, accept_ranges=True,
+                                     complete_length=response.content_length)
+
+
 @app.route("/images/<filename>")
 def serve_image(filename):
     """Serve captured images from the captures directory."""
     try:
-        return send_from_directory(CAPTURE_DIR, filename)
+        st = os.stat(os.path.join(CAPTURE_DIR, os.path.basename(filename)))
+        response = send_from_directory(CAPTURE_DIR, filename, conditional=False, etag=False)
+        return _send_cached(response, st, "full")
     except Exception as e:
         print("IMAGE SERVE ERROR:", e)
         return jsonify({"status": "error", "msg": "Image not found"}), 404
 
 
+@app.route("/thumbs/<int:width>/<filename>")
+def serve_thumbnail(width, filename):
+    """Serve a cached thumbnail, generating it on first request."""
+    try:
+        path, st = thumbnails.get(filename, width)
+        if path is None:
+            # Unknown width or no Pillow: fall back to the full image
+            return serve_image(filename)
+        response = send_file(path, mimetype="image/jpeg", conditional=False, etag=False)
+        return _send_cached(response, st, f"w{width}")
+    except Exception as e:
+        print("THUMB SERVE ERROR:", e)
+        return jsonify({"status": "error", "msg": "Image not found"}), 404
+
+
 @app.route("/api/images")
+@response_cache.cached(ttl=IMAGES_CACHE_TTL, tags=("images",), before=image_index.refresh)
 def api_images():
-    """Get list of all captured images."""
+    """
+    Get a page of captured images, newest first.
+    Query params: cursor, limit, date (YYYY-MM-DD), type (manual|obstacle|other)
+    """
     try:
-        # Get images from local directory
-        if os.path.exists(CAPTURE_DIR):
-            files = [f for f in os.listdir(CAPTURE_DIR) 
-                    if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            # Sort by modification time, newest first
-            files.sort(key=lambda x: os.path.getmtime(os.path.join(CAPTURE_DIR, x)), reverse=True)
-            
-            images = []
-            for f in files:
-                file_path = os.path.join(CAPTURE_DIR, f)
-                images.append({
-                    "filename": f,
-                    "url": f"/images/{f}",
-                    "timestamp": os.path.getmtime(file_path),
-                    "size": os.path.getsize(file_path)
-                })
-            
-            return jsonify({"status": "ok", "images": images, "count": len(images)})
-        else:
-            return jsonify({"status": "ok", "images": [], "count": 0})
+        limit = min(max(int(request.args.get("limit", IMAGES_PAGE_SIZE)), 1), IMAGES_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"status": "error", "msg": "invalid limit"}), 400
+
+    try:
+        images, next_cursor, total = image_index.page(
+            cursor=request.args.get("cursor"),
+            limit=limit,
+            date=request.args.get("date") or None,
+            origin=request.args.get("type") or None,
+        )
+        return jsonify({
+            "status": "ok",
+            "images": images,
+            "count": total,
+            "next_cursor": next_cursor
+        })
     except Exception as e:
         print("IMAGE LIST ERROR:", e)
         return jsonify({"status": "error", "msg": str(e)}), 500
@@ -295,23 +644,10 @@ def api_images():
 def api_latest_image():
     """Get info about the most recently captured image."""
     try:
-        # Check local directory first
-        if os.path.exists(CAPTURE_DIR):
-            files = [f for f in os.listdir(CAPTURE_DIR) 
-                    if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            if files:
-                # Get most recent file
-                latest = max(files, key=lambda x: os.path.getmtime(os.path.join(CAPTURE_DIR, x)))
-                file_path = os.path.join(CAPTURE_DIR, latest)
-                return jsonify({
-                    "status": "ok",
-                    "image": {
-                        "filename": latest,
-                        "url": f"/images/{latest}",
-                        "timestamp": os.path.getmtime(file_path)
-                    }
-                })
-        
+        latest = image_index.latest()
+        if latest is not None:
+            return jsonify({"status": "ok", "image": latest})
+
         # Fall back to Adafruit IO if no local images
         image_data = aio_get("smartcar-images")
         if image_data != "N/A":
@@ -329,4 +665,5 @@ def not_found(e):
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
+    app.run(debug=os.getenv("FLASK_DEBUG", "1") not in ("0", "false", "no"), threaded=True)
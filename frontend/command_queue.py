@@ -0,0 +1,303 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# Latest-wins: a newer movement command replaces a pending one for the same car
+MOVEMENT_COMMANDS = ("forward", "backward", "left", "right")
+# Sent ahead of everything else and never delayed by the debounce window
+STOP_COMMANDS = ("stop", "manual_stop")
+
+ACCEPTED = "accepted"     # goes out on the next publish
+QUEUED = "queued"         # waiting for the rate limit
+COALESCED = "coalesced"   # replaced an unsent movement command
+REJECTED = "rejected"     # too many pending commands for this car
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class SharedTokenBucket(TokenBucket):
+    def __init__(self, path, rate_per_minute, burst):
+        """
+        TokenBucket whose state lives in a small JSON file under an
+        exclusive flock, so every gunicorn worker draws from one budget.
+        Uses the wall clock (monotonic clocks are not comparable between
+        processes); the `now` arguments are ignored.
+        """
+        super().__init__(rate_per_minute, burst)
+        self.path = path
+        self.updated = time.time()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _locked(self, spend):
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                    self.tokens, self.updated = float(state["tokens"]), float(state["updated"])
+                except (ValueError, KeyError, TypeError):
+                    self.tokens, self.updated = self.capacity, time.time()
+                TokenBucket._refill(self, time.time())
+                if spend:
+                    self.tokens -= 1
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": self.tokens, "updated": self.updated}))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def take(self, now):
+        self._locked(spend=True)
+
+    def wait_time(self, now):
+        self._locked(spend=False)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+def make_bucket(rate_per_minute, burst, path=None):
+    """Bucket shared between processes through `path` when possible, else per process."""
+    if path and HAS_FCNTL:
+        return SharedTokenBucket(path, rate_per_minute, burst)
+    return TokenBucket(rate_per_minute, burst)
+
+
+class _Pending:
+    def __init__(self, ready_at):
+        self.ready_at = ready_at
+        # Commands in submission order; movement/stop coalesces only at the tail
+        self.commands = []
+        self.tail_is_movement = False
+        # A stop is waiting: publish ahead of other cars and of the rate limit
+        self.urgent = False
+        self.attempts = 0
+
+    def add(self, value, movement):
+        """Append value; a movement right after another one replaces it. Returns True if coalesced."""
+        if movement and self.tail_is_movement:
+            self.commands[-1] = value
+            return True
+        self.commands.append(value)
+        self.tail_is_movement = movement
+        return False
+
+
+class CommandDispatcher:
+    def __init__(self, publish, rate_per_minute=20, burst=3, debounce=0.15, max_pending=20,
+                 max_retries=3, retry_delay=1.0, retryable=None, bucket_path=None):
+        """
+        Aggregates dashboard commands before they are published to the command feed.
+
+        publish(message) sends one feed value and returns True on success,
+        False if it was not sent, or raises.
+        Commands are grouped per car and keep their submission order.
+        Movement commands are debounced for `debounce` seconds and a
+        movement that directly follows another unsent one replaces it, so a
+        burst of joystick/arrow presses collapses to the newest. The whole
+        group goes out as a single publish, limited by a token bucket
+        (rate_per_minute, burst) sized to the upstream feed quota. With
+        bucket_path the bucket is a file shared by every worker process.
+
+        A stop is never held back: its group is published immediately,
+        ahead of other cars and without waiting for a token (it still
+        consumes one, so the quota catches up afterwards). A publish that
+        provably never reached the server (False, or an exception for which
+        retryable(exc) is True) is retried up to max_retries times with
+        doubling delays. Any other error may have been delivered, so the
+        group is dropped rather than sent twice; drops are reported in
+        stats()["last_failure"].
+        """
+        self.publish = publish
+        self.retryable = retryable
+        self.bucket = make_bucket(rate_per_minute, burst, bucket_path)
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._cond = threading.Condition()
+        # car_id (None = unaddressed) -> _Pending, in arrival order
+        self._pending = {}
+        self._next_id = 0
+        self._thread = None
+        self.last_failure = None
+        self.stats_counts = {ACCEPTED: 0, QUEUED: 0, COALESCED: 0, REJECTED: 0,
+                             "published": 0, "commands_sent": 0, "publish_errors": 0,
+                             "retries": 0, "dropped": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="command-dispatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, value, car_id=None):
+        """
+        Queue one command; returns {"dispatch": status, "id": n, "eta": seconds}.
+        value is a command string or a drive dict ({"drive": [...]}), which
+        counts as movement.
+        """
+        if isinstance(value, dict):
+            cmd = "drive" if "drive" in value else ""
+        else:
+            value = str(value)
+            cmd = value.strip().lower()
+        stop = cmd in STOP_COMMANDS
+        movement = stop or cmd in MOVEMENT_COMMANDS or cmd == "drive"
+        now = time.monotonic()
+        with self._cond:
+            pending = self._pending.get(car_id)
+            if pending is None:
+                pending = self._pending[car_id] = _Pending(now + self.debounce)
+            elif (not stop and not (movement and pending.tail_is_movement)
+                  and len(pending.commands) >= self.max_pending):
+                self.stats_counts[REJECTED] += 1
+                return {"dispatch": REJECTED, "id": None, "eta": None}
+
+            self._next_id += 1
+            cmd_id = self._next_id
+            status = COALESCED if pending.add(value, movement) else None
+            if stop:
+                # Stop skips the debounce, the rate limit and the other cars' queue
+                pending.ready_at = now
+                pending.urgent = True
+
+            eta = 0.0 if pending.urgent else max(pending.ready_at - now, self._eta_locked(car_id, now))
+            if status is None:
+                status = ACCEPTED if eta <= self.debounce + 1e-3 else QUEUED
+            self.stats_counts[status] += 1
+            self._cond.notify()
+        return {"dispatch": status, "id": cmd_id, "eta": round(eta, 2)}
+
+    def _eta_locked(self, car_id, now):
+        """Seconds until this car's group can be published under the rate limit."""
+        ahead = 0
+        for key in self._pending:
+            if key == car_id:
+                break
+            ahead += 1
+        wait = self.bucket.wait_time(now)
+        return wait + ahead / self.bucket.rate if ahead else wait
+
+    @staticmethod
+    def encode(car_id, commands):
+        """Feed value for a group: plain string for one unaddressed command, JSON otherwise."""
+        if car_id is None and len(commands) == 1 and isinstance(commands[0], str):
+            return commands[0]
+        if len(commands) > 1:
+            message = {"commands": commands}
+        elif isinstance(commands[0], dict):
+            message = dict(commands[0])
+        else:
+            message = {"value": commands[0]}
+        if car_id is not None:
+            message["car_id"] = car_id
+        return json.dumps(message)
+
+    def _next_ready_locked(self, now):
+        """
+        (car_id, pending) of the group to publish now, else (None, seconds to wait).
+        Urgent (stop) groups win and ignore the bucket; others need a token.
+        """
+        soonest = None
+        # car_id None is a valid key (unaddressed commands), so track the group itself
+        first_ready = None
+        for car_id, pending in self._pending.items():
+            if pending.ready_at <= now:
+                if pending.urgent:
+                    return car_id, pending
+                if first_ready is None:
+                    first_ready = (car_id, pending)
+            elif soonest is None or pending.ready_at < soonest:
+                soonest = pending.ready_at
+        if first_ready is not None:
+            wait = self.bucket.wait_time(now)
+            if wait <= 0:
+                return first_ready
+            soonest = now + wait if soonest is None else min(soonest, now + wait)
+        return None, (None if soonest is None else soonest - now)
+
+    def _requeue_locked(self, car_id, failed, now):
+        """Put a failed group back in front of anything submitted for the car since."""
+        failed.attempts += 1
+        failed.ready_at = now + self.retry_delay * 2 ** (failed.attempts - 1)
+        newer = self._pending.pop(car_id, None)
+        if newer is not None:
+            for value in newer.commands:
+                failed.commands.append(value)
+            failed.tail_is_movement = newer.tail_is_movement
+            failed.urgent = failed.urgent or newer.urgent
+            if newer.urgent:
+                failed.ready_at = now
+        self._pending[car_id] = failed
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    car_id, pending = self._next_ready_locked(now)
+                    if isinstance(pending, _Pending):
+                        break
+                    self._cond.wait(timeout=pending)
+                self.bucket.take(now)
+                del self._pending[car_id]
+
+            commands = list(pending.commands)
+            ok = False
+            error = None
+            # Re-sending is only safe when the message never reached the server
+            resend = True
+            try:
+                ok = self.publish(self.encode(car_id, commands))
+            except Exception as e:
+                error = str(e)
+                resend = self.retryable is not None and self.retryable(e)
+                print("COMMAND PUBLISH ERROR:", e)
+            with self._cond:
+                if ok:
+                    self.stats_counts["published"] += 1
+                    self.stats_counts["commands_sent"] += len(commands)
+                    continue
+                self.stats_counts["publish_errors"] += 1
+                if resend and pending.attempts < self.max_retries:
+                    self.stats_counts["retries"] += 1
+                    self._requeue_locked(car_id, pending, time.monotonic())
+                    self._cond.notify()
+                else:
+                    self.stats_counts["dropped"] += len(commands)
+                    self.last_failure = {"car_id": car_id, "commands": commands,
+                                         "error": error or "publish failed", "at": time.time()}
+                    print(f"COMMAND PUBLISH FAILED after {pending.attempts + 1} attempts:", commands)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return dict(self.stats_counts,
+                        pending={str(k): len(p.commands) for k, p in self._pending.items()},
+                        last_failure=self.last_failure,
+                        tokens=round(min(self.bucket.capacity, self.bucket.tokens), 2),
+                        next_slot=round(self.bucket.wait_time(now), 2))
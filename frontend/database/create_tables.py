@@ -1,4 +1,9 @@
-from db import get_db_connection
+# Run from the repository root so the backend package is importable:
+#   python -m frontend.database.create_tables
+from frontend.database.db import get_db_connection
+
+# The telemetry schema (partitions, indexes, rollups) is owned by the backend
+from backend.cloud_schema import migrate
 
 def create_tables():
     conn = get_db_connection()
@@ -43,18 +48,12 @@ def create_tables():
         );
     """)
 
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS telemetry (
-            id SERIAL PRIMARY KEY,
-            timestamp TIMESTAMP DEFAULT NOW(),
-            ir_value INTEGER,
-            ultrasonic_value FLOAT,
-            speed_value INTEGER
-        );
-    """)
-
     conn.commit()
     cur.close()
+
+    # telemetry + rollups: same migrations CloudSync runs on the car
+    version = migrate(conn)
+    print(f"Telemetry schema at version {version}")
     conn.close()
 
 if __name__ == "__main__":
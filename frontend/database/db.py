@@ -1,11 +1,81 @@
 import os
+import atexit
+import threading
 from dotenv import load_dotenv
 import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import ConnectionPool
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool sizing / health (override through the environment)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", 300))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 1800))
+# Server-side prepared statements; disable behind a transaction-mode pgbouncer
+DB_PREPARE = os.getenv("DB_PREPARE", "1") not in ("0", "false", "no")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_conninfo():
+    """DATABASE_URL if set, otherwise the discrete DB_HOST/DB_PORT/... settings."""
+    if DATABASE_URL:
+        return DATABASE_URL
+    return make_conninfo(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASS")
+    )
+
+
 def get_db_connection():
     # psycopg 3 uses psycopg.connect
-    return psycopg.connect(DATABASE_URL)
+    return psycopg.connect(get_conninfo())
+
+
+def get_pool():
+    """Process-wide connection pool, opened on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_conninfo(),
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    # Validate connections on checkout (Neon drops idle TLS sessions)
+                    check=ConnectionPool.check_connection,
+                    kwargs={} if DB_PREPARE else {"prepare_threshold": None},
+                    name="smartcar",
+                    open=True
+                )
+                atexit.register(close_pool)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pool_stats():
+    """Pool counters (connections, waiting requests, wait times, errors)."""
+    if _pool is None:
+        return {"open": False}
+    stats = _pool.get_stats()
+    stats["open"] = True
+    return stats
@@ -0,0 +1,172 @@
+import threading
+from psycopg import sql
+
+# Known column names for each chart series, in order of preference.
+# Covers both the backend CloudSync schema (ts, ir, distance, motor) and
+# create_tables.py (timestamp, ir_value, ultrasonic_value, speed_value).
+CANDIDATES = {
+    "timestamp": ("ts", "timestamp", "time", "created_at"),
+    "ir": ("ir", "ir_value"),
+    "ultrasonic": ("distance", "ultrasonic_value", "ultrasonic"),
+    "speed": ("speed_value", "speed", "motor"),
+}
+
+# Pre-aggregated tables kept by CloudSync (backend/cloud_schema.py), keyed by
+# bucket width in seconds. Chart buckets that are a multiple of the width are
+# summed from these instead of scanning raw rows.
+ROLLUP_TABLES = {3600: "telemetry_rollup_hour", 60: "telemetry_rollup_minute"}
+
+
+def _pick(columns, series):
+    names = [c for c, _ in columns]
+    for cand in CANDIDATES[series]:
+        if cand in names:
+            return cand
+    return None
+
+
+def _value_expr(column, data_type):
+    """SQL expression yielding a number for a series column (or NULL)."""
+    if column is None:
+        return sql.SQL("NULL::float")
+    ident = sql.Identifier(column)
+    if data_type in ("json", "jsonb"):
+        # motor is stored as a 4-element array: chart the first wheel
+        return sql.SQL("CASE WHEN jsonb_typeof({c}::jsonb) = 'array' THEN ({c}::jsonb->>0)::float END").format(c=ident)
+    return ident
+
+
+class TelemetrySchema:
+    def __init__(self, table="telemetry"):
+        """
+        Resolves which telemetry columns feed the history charts once and
+        caches the resulting queries. Call refresh() after a schema change.
+        """
+        self.table = table
+        self._lock = threading.Lock()
+        self.mapping = None
+        # (kind, filtered_by_car) -> composed query; kinds: day, recent, bucket,
+        # and one rollup-<seconds> per rollup table present
+        self._queries = {}
+
+    def query(self, kind, car_id=None):
+        """Cached query of `kind`, restricted to one car when car_id is given (and supported)."""
+        with self._lock:
+            return self._queries.get((kind, bool(car_id) and self.has_car)) or self._queries.get((kind, False))
+
+    @property
+    def has_car(self):
+        return bool(self.mapping and self.mapping.get("car"))
+
+    def refresh(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_name = %s
+                ORDER BY ordinal_position
+            """, (self.table,))
+            columns = cur.fetchall()
+            # Rollups from before the per-column counts (cloud_schema migration 5) are skipped
+            cur.execute("""
+                SELECT table_name FROM information_schema.columns
+                WHERE table_name = ANY(%s) AND column_name = 'speed_n'
+            """, (list(ROLLUP_TABLES.values()),))
+            rollups = {row[0] for row in cur.fetchall()}
+
+        with self._lock:
+            if not columns:
+                # No table yet: don't cache, look again on the next request
+                self.mapping = None
+                self._queries = {}
+                return {}
+
+            types = dict(columns)
+            mapping = {series: _pick(columns, series) for series in CANDIDATES}
+            mapping["car"] = "car_id" if "car_id" in types else None
+            self.mapping = mapping
+            self._queries = {}
+
+            select = sql.SQL(", ").join([
+                sql.Identifier(mapping["timestamp"] or "id"),
+                _value_expr(mapping["ir"], types.get(mapping["ir"])),
+                _value_expr(mapping["ultrasonic"], types.get(mapping["ultrasonic"])),
+                _value_expr(mapping["speed"], types.get(mapping["speed"])),
+            ])
+            table = sql.Identifier(self.table)
+            order = sql.Identifier(mapping["timestamp"] or "id")
+
+            # min/max/avg per fixed-width bucket; buckets align to a fixed origin
+            aggregates = []
+            for series in ("ir", "ultrasonic", "speed"):
+                expr = _value_expr(mapping[series], types.get(mapping[series]))
+                aggregates += [sql.SQL("min({})").format(expr),
+                               sql.SQL("max({})").format(expr),
+                               sql.SQL("avg({})::float").format(expr)]
+
+            for by_car in ((False, True) if mapping["car"] else (False,)):
+                car = sql.SQL(" AND {} = %(car)s").format(sql.Identifier(mapping["car"])) if by_car else sql.SQL("")
+                where_car = sql.SQL(" WHERE {} = %(car)s").format(sql.Identifier(mapping["car"])) if by_car else sql.SQL("")
+
+                self._queries[("recent", by_car)] = sql.SQL("""
+                    SELECT {select} FROM {table}{where_car} ORDER BY {order} DESC LIMIT 100
+                """).format(select=select, table=table, where_car=where_car, order=order)
+
+                if not mapping["timestamp"]:
+                    continue
+                ts = sql.Identifier(mapping["timestamp"])
+                # Half-open range on the raw column so an index on it can be used
+                self._queries[("day", by_car)] = sql.SQL("""
+                    SELECT {select} FROM {table}
+                    WHERE {ts} >= %(day)s::date AND {ts} < %(day)s::date + 1{car}
+                    ORDER BY {ts} ASC
+                """).format(select=select, table=table, ts=ts, car=car)
+                self._queries[("bucket", by_car)] = sql.SQL("""
+                    SELECT extract(epoch FROM date_bin(%(bucket)s, {ts}, TIMESTAMP '2000-01-01'))::bigint AS b,
+                           count(*), {aggregates}
+                    FROM {table}
+                    WHERE {ts} >= %(start)s AND {ts} < %(end)s{car}
+                    GROUP BY b
+                    ORDER BY b
+                """).format(ts=ts, table=table, car=car, aggregates=sql.SQL(", ").join(aggregates))
+
+                # Same result shape from the rollups: min of mins, max of maxes, and
+                # averages over each column's non-NULL count (like avg() on raw rows)
+                rollup_aggregates = sql.SQL(", ").join(
+                    sql.SQL("min({p}_min), max({p}_max), (sum({p}_sum) / nullif(sum({p}_n), 0))::float").format(
+                        p=sql.SQL(prefix))
+                    for prefix in ("ir", "distance", "speed"))
+                for width, rollup in ROLLUP_TABLES.items():
+                    if rollup not in rollups:
+                        continue
+                    self._queries[(f"rollup-{width}", by_car)] = sql.SQL("""
+                        SELECT extract(epoch FROM date_bin(%(bucket)s, bucket, TIMESTAMP '2000-01-01'))::bigint AS b,
+                               sum(n)::bigint, {aggregates}
+                        FROM {table}
+                        WHERE bucket >= %(start)s AND bucket < %(end)s{car}
+                        GROUP BY b
+                        ORDER BY b
+                    """).format(table=sql.Identifier(rollup), car=sql.SQL(" AND car_id = %(car)s") if by_car else sql.SQL(""),
+                                aggregates=rollup_aggregates)
+            return mapping
+
+    def series_query(self, bucket_seconds, car_id=None):
+        """
+        (query, source) for a chart with buckets of bucket_seconds: the
+        coarsest rollup table that divides the bucket, else the raw table.
+        """
+        for width, rollup in ROLLUP_TABLES.items():
+            if bucket_seconds % width == 0:
+                query = self.query(f"rollup-{width}", car_id)
+                if query is not None:
+                    return query, rollup
+        return self.query("bucket", car_id), self.table
+
+    def ensure(self, conn):
+        if self.mapping is None:
+            return self.refresh(conn)
+        return self.mapping
+
+    def invalidate(self):
+        with self._lock:
+            self.mapping = None
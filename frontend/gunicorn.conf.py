@@ -0,0 +1,40 @@
+# gunicorn.conf.py — Production serving settings for the Flask app
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Handlers block on Adafruit IO and Postgres, and every open live stream
+# (/api/live/stream) holds a thread, so each worker runs a thread pool
+# (gthread): a slow upstream only ties up its own thread, never the worker.
+# Everything can be overridden from the environment.
+import os
+
+from serving import WEB_CONCURRENCY, WEB_THREADS
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Processes: each one has its own MQTT subscription, DB pool and caches
+workers = WEB_CONCURRENCY
+worker_class = "gthread"
+# Threads per worker = concurrent requests per worker (live streams included;
+# app.py leaves WEB_RESERVED_THREADS of them to other routes)
+threads = WEB_THREADS
+
+# Slow upstreams time out after a few seconds; this only catches stuck workers
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+graceful_timeout = 20
+# Reuse browser/proxy connections between requests
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+
+# No preload: app.py starts background threads (MQTT, schema warmup) at import,
+# and threads do not survive the fork into workers
+preload_app = False
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+
+def worker_exit(server, worker):
+    # Return Postgres connections instead of letting them time out server-side
+    from database.db import close_pool
+    close_pool()
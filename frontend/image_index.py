@@ -0,0 +1,187 @@
+import os
+import struct
+import bisect
+import threading
+import time
+from datetime import datetime
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# -------------------------------------------
+# IMAGE HEADER PARSING (no Pillow needed)
+# -------------------------------------------
+def read_dimensions(path):
+    """Return (width, height) from a JPEG/PNG header, or (None, None)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(26)
+            if head[:8] == b"\x89PNG\r\n\x1a\n":
+                w, h = struct.unpack(">II", head[16:24])
+                return w, h
+            if head[:2] != b"\xff\xd8":
+                return None, None
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None, None
+                code = marker[1]
+                if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                    continue
+                seg_len = struct.unpack(">H", f.read(2))[0]
+                # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    h, w = struct.unpack(">xHH", f.read(5))
+                    return w, h
+                f.seek(seg_len - 2, 1)
+    except Exception:
+        return None, None
+
+
+def image_origin(filename):
+    """Classify a capture by the prefix the backend gives it."""
+    if filename.startswith("manual"):
+        return "manual"
+    if filename.startswith("obstacle"):
+        return "obstacle"
+    return "other"
+
+
+# -------------------------------------------
+# INDEX
+# -------------------------------------------
+class ImageIndex:
+    def __init__(self, directory, min_refresh_interval=1.0):
+        """
+        In-memory index of the capture directory.
+
+        The directory's own mtime changes whenever a file is added, renamed
+        or removed, so a refresh costs one stat() until something actually
+        changes; only then is the directory re-scanned with os.scandir().
+        Dimensions are parsed once per (filename, mtime, size).
+        """
+        self.directory = directory
+        self.min_refresh_interval = min_refresh_interval
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._last_check = 0.0
+        self._by_name = {}
+        # Sorted ascending by (-mtime, filename) => newest first
+        self._keys = []
+        self._entries = []
+        self._counts = {}
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """fn() is called after a rescan found the directory changed."""
+        self._listeners.append(fn)
+
+    def refresh(self, force=False):
+        now = time.time()
+        if not force and now - self._last_check < self.min_refresh_interval:
+            return
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        with self._lock:
+            self._last_check = now
+            if not force and dir_mtime == self._dir_mtime:
+                return
+            self._rescan()
+            self._dir_mtime = dir_mtime
+        for fn in self._listeners:
+            try:
+                fn()
+            except Exception as e:
+                print("IMAGE INDEX LISTENER ERROR:", e)
+
+    def _rescan(self):
+        by_name = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                name = entry.name
+                if not name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                    continue
+                st = entry.stat()
+                old = self._by_name.get(name)
+                if old and old["timestamp"] == st.st_mtime and old["size"] == st.st_size:
+                    by_name[name] = old
+                    continue
+                width, height = read_dimensions(entry.path)
+                by_name[name] = {
+                    "filename": name,
+                    "url": f"/images/{name}",
+                    "thumb_url": f"/thumbs/320/{name}",
+                    "timestamp": st.st_mtime,
+                    "size": st.st_size,
+                    "width": width,
+                    "height": height,
+                    "origin": image_origin(name),
+                    "date": datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d"),
+                }
+        entries = sorted(by_name.values(), key=lambda e: (-e["timestamp"], e["filename"]))
+        self._by_name = by_name
+        self._entries = entries
+        self._keys = [(-e["timestamp"], e["filename"]) for e in entries]
+        self._counts = {}
+
+    # --- queries ---
+    def latest(self):
+        self.refresh()
+        with self._lock:
+            return self._entries[0] if self._entries else None
+
+    def get(self, filename):
+        self.refresh()
+        with self._lock:
+            return self._by_name.get(filename)
+
+    def total(self):
+        self.refresh()
+        with self._lock:
+            return len(self._entries)
+
+    def page(self, cursor=None, limit=50, date=None, origin=None):
+        """
+        Return (images, next_cursor, matched_total) newest first.
+        cursor: opaque string returned as next_cursor by the previous page.
+        date: 'YYYY-MM-DD' (local time of the file mtime); origin: manual/obstacle/other.
+        """
+        self.refresh()
+        with self._lock:
+            entries, keys, counts = self._entries, self._keys, self._counts
+
+        start = 0
+        if cursor:
+            try:
+                ts, name = cursor.split(":", 1)
+                start = bisect.bisect_right(keys, (-float(ts), name))
+            except ValueError:
+                start = 0
+
+        def match(e):
+            return (date is None or e["date"] == date) and (origin is None or e["origin"] == origin)
+
+        if date is None and origin is None:
+            images = entries[start:start + limit]
+            matched = len(entries)
+        else:
+            images = []
+            for e in entries[start:]:
+                if match(e):
+                    images.append(e)
+                    if len(images) == limit:
+                        break
+            matched = counts.get((date, origin))
+            if matched is None:
+                matched = counts[(date, origin)] = sum(1 for e in entries if match(e))
+
+        next_cursor = None
+        if len(images) == limit:
+            last = images[-1]
+            next_idx = bisect.bisect_right(keys, (-last["timestamp"], last["filename"]))
+            if next_idx < len(entries):
+                next_cursor = f"{last['timestamp']!r}:{last['filename']}"
+        return images, next_cursor, matched
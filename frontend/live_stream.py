@@ -0,0 +1,82 @@
+import json
+import queue
+import threading
+import time
+
+
+class LiveBroadcaster:
+    def __init__(self, heartbeat=15.0, client_queue_size=4, max_clients=12):
+        """
+        Fan out telemetry to Server-Sent Events clients.
+
+        Every message is serialised once and offered to each client's small
+        bounded queue. A client that cannot keep up loses its oldest queued
+        updates rather than slowing down the publisher or other clients.
+        Idle connections get a comment line every `heartbeat` seconds so
+        proxies keep them open and dead sockets are noticed.
+
+        Each client holds a server thread while connected, so max_clients
+        must stay below the worker's thread count (see serving.py).
+        """
+        self.heartbeat = heartbeat
+        self.client_queue_size = client_queue_size
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        # queue -> car_id filter (None = every car)
+        self._clients = {}
+        self._event_id = 0
+        self.published = 0
+        self.dropped = 0
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def subscribe(self, car_id=None):
+        """Register a new client for one car (or all); returns its queue or None when full."""
+        q = queue.Queue(maxsize=self.client_queue_size)
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return None
+            self._clients[q] = car_id
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.pop(q, None)
+
+    def publish(self, data, car_id=None, event="telemetry"):
+        with self._lock:
+            self._event_id += 1
+            message = f"id: {self._event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            clients = [q for q, want in self._clients.items() if want is None or want == car_id]
+            self.published += 1
+        for q in clients:
+            self._offer(q, message)
+
+    def _offer(self, q, message):
+        while True:
+            try:
+                q.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    with self._lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def stream(self, q, initial=None, event="telemetry"):
+        """Generator producing the SSE byte stream for one subscribed client."""
+        try:
+            yield "retry: 3000\n\n"
+            if initial is not None:
+                yield f"event: {event}\ndata: {json.dumps(initial)}\n\n"
+            while True:
+                try:
+                    yield q.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield f": ping {int(time.time())}\n\n"
+        finally:
+            self.unsubscribe(q)
@@ -0,0 +1,130 @@
+# loadtest.py — Requests/second and latency for the main API routes
+#
+#   python loadtest.py --url http://localhost:5000 --concurrency 32 --duration 20
+#   python loadtest.py --endpoints /api/live /api/history?date=2025-11-04
+#
+# Standard library only. Each client thread keeps one HTTP/1.1 connection
+# open and requests its endpoint back to back for the whole duration.
+import argparse
+import datetime
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def default_endpoints():
+    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+    return ["/api/live", f"/api/history?date={yesterday}", "/api/images?limit=50"]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class Client(threading.Thread):
+    def __init__(self, url, path, deadline, timeout):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = path
+        self.deadline = deadline
+        self.timeout = timeout
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+        self.cache_hits = 0
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def run(self):
+        conn = self._connect()
+        while time.monotonic() < self.deadline:
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", self.path, headers={"Connection": "keep-alive"})
+                resp = conn.getresponse()
+                resp.read()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = self._connect()
+                continue
+            self.latencies.append(time.perf_counter() - t0)
+            self.statuses[resp.status] = self.statuses.get(resp.status, 0) + 1
+            if resp.getheader("X-Cache") == "HIT":
+                self.cache_hits += 1
+        conn.close()
+
+
+def run_endpoint(url, path, concurrency, duration, timeout):
+    deadline = time.monotonic() + duration
+    clients = [Client(url, path, deadline, timeout) for _ in range(concurrency)]
+    started = time.monotonic()
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(l for c in clients for l in c.latencies)
+    statuses = {}
+    for c in clients:
+        for code, n in c.statuses.items():
+            statuses[code] = statuses.get(code, 0) + n
+
+    def ms(v):
+        return None if v is None else round(v * 1000, 2)
+
+    return {
+        "endpoint": path,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "errors": sum(c.errors for c in clients),
+        "statuses": statuses,
+        "cache_hits": sum(c.cache_hits for c in clients),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Smart Car dashboard API")
+    parser.add_argument("--url", default="http://localhost:5000", help="base URL of the server")
+    parser.add_argument("--endpoints", nargs="+", default=None,
+                        help="paths to test (default: /api/live, /api/history, /api/images)")
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel connections per endpoint")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per endpoint")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout (s)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.endpoints or default_endpoints():
+        result = run_endpoint(args.url, path, args.concurrency, args.duration, args.timeout)
+        results.append(result)
+        if not args.json:
+            lat = result["latency_ms"]
+            print(f"{path:40s} {result['rps']:8.1f} req/s  p50={lat['p50']}ms p95={lat['p95']}ms "
+                  f"p99={lat['p99']}ms  errors={result['errors']} statuses={result['statuses']} "
+                  f"cache_hits={result['cache_hits']}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, request
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, disk_dir=None, max_disk_entries=2000, tag_poll_interval=1.0):
+        """
+        Cache for JSON API responses, keyed by route and query arguments.
+
+        Entries live in an in-process LRU (max_entries) and, when disk_dir is
+        set, in a directory shared by every worker process. Each entry has a
+        TTL in seconds, or None for data that never changes (closed days).
+
+        Entries carry tags ("history", "images", ...). invalidate(tag) bumps
+        the tag's generation and every entry stored under an older generation
+        becomes a miss. With a disk cache the generation is a small file, so
+        an invalidation in one worker reaches the others within
+        tag_poll_interval seconds.
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.tag_poll_interval = tag_poll_interval
+        self._lock = threading.Lock()
+        # key -> (expires_at or None, {tag: generation}, status, mimetype, body)
+        self._entries = OrderedDict()
+        # tag -> (generation, checked_at)
+        self._generations = {}
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._routes = {}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # --- tags ---
+    def _tag_path(self, tag):
+        return os.path.join(self.disk_dir, f"tag-{tag}")
+
+    def generation(self, tag):
+        now = time.time()
+        with self._lock:
+            cached = self._generations.get(tag)
+            if cached is not None and (not self.disk_dir or now - cached[1] < self.tag_poll_interval):
+                return cached[0]
+        gen = cached[0] if cached else 0
+        if self.disk_dir:
+            try:
+                with open(self._tag_path(tag)) as f:
+                    gen = int(f.read() or 0)
+            except (OSError, ValueError):
+                gen = 0
+        with self._lock:
+            self._generations[tag] = (gen, now)
+        return gen
+
+    def invalidate(self, *tags):
+        """Drop everything stored under any of `tags`; no tags drops everything."""
+        with self._lock:
+            self.invalidations += 1
+            if not tags:
+                self._entries.clear()
+                self._generations.clear()
+        if not tags:
+            if self.disk_dir:
+                for name in os.listdir(self.disk_dir):
+                    if name.endswith(".json"):
+                        self._remove(os.path.join(self.disk_dir, name))
+            return
+        for tag in tags:
+            # Nanosecond clock: unique across workers without read-modify-write
+            gen = time.time_ns()
+            if self.disk_dir:
+                tmp = f"{self._tag_path(tag)}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    f.write(str(gen))
+                os.replace(tmp, self._tag_path(tag))
+            with self._lock:
+                self._generations[tag] = (gen, time.time())
+
+    def _fresh(self, entry, now):
+        expires, tags = entry[0], entry[1]
+        if expires is not None and expires <= now:
+            return False
+        return all(self.generation(tag) == gen for tag, gen in tags.items())
+
+    # --- storage ---
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Return (status, mimetype, body) or None; counts hits and misses."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and self._fresh(entry, now):
+            with self._lock:
+                self.hits += 1
+            return entry[2:]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path) as f:
+                    stored = json.load(f)
+                entry = (stored["expires"], stored["tags"], stored["status"], stored["mimetype"],
+                         stored["body"].encode())
+            except (OSError, ValueError, KeyError):
+                entry = None
+            if entry is not None and stored.get("key") == key and self._fresh(entry, now):
+                self._store_memory(key, entry)
+                with self._lock:
+                    self.disk_hits += 1
+                return entry[2:]
+            if entry is not None:
+                self._remove(path)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self.misses += 1
+        return None
+
+    def generations(self, tags):
+        """{tag: generation} for `tags`; take it before building a response and pass it to set()."""
+        return {tag: self.generation(tag) for tag in tags}
+
+    def set(self, key, status, mimetype, body, ttl=None, tags=()):
+        """
+        Store a response; ttl None keeps it until one of its tags is invalidated.
+        tags: tag names, or the generations() taken before the body was built,
+        so an invalidation that lands while it is being built still wins.
+        """
+        expires = None if ttl is None else time.time() + ttl
+        generations = tags if isinstance(tags, dict) else self.generations(tags)
+        entry = (expires, generations, status, mimetype, body)
+        self._store_memory(key, entry)
+        if self.disk_dir:
+            self._store_disk(key, entry)
+
+    def _store_memory(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _store_disk(self, key, entry):
+        path = self._disk_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"key": key, "expires": entry[0], "tags": entry[1], "status": entry[2],
+                           "mimetype": entry[3], "body": entry[4].decode()}, f)
+            os.replace(tmp, path)
+        except (OSError, UnicodeDecodeError) as e:
+            print("RESPONSE CACHE WRITE ERROR:", e)
+            self._remove(tmp)
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % 100 == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Keep the newest max_disk_entries files (by mtime)."""
+        try:
+            files = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        for e in files[:len(files) - self.max_disk_entries]:
+            self._remove(e.path)
+            with self._lock:
+                self.evictions += 1
+
+    # --- Flask integration ---
+    @staticmethod
+    def request_key():
+        args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        return f"{request.path}?{args}"
+
+    @staticmethod
+    def bypass():
+        """Called by a view to keep the current response out of the cache (e.g. on errors)."""
+        g.response_cache_bypass = True
+
+    def _count_route(self, route, hit):
+        with self._lock:
+            counts = self._routes.setdefault(route, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def cached(self, ttl=60, tags=(), before=None):
+        """
+        Decorator for GET views returning JSON.
+        ttl: seconds, None (until invalidated) or a callable(args) -> either.
+        tags: tuple of tags or a callable(args) -> tuple.
+        before: callable run ahead of every lookup, hits included (a place to
+        notice changes and invalidate tags).
+        Sets X-Cache: HIT/MISS on the response.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != "GET":
+                    return view(*args, **kwargs)
+                if before is not None:
+                    before()
+                key = self.request_key()
+                hit = self.get(key)
+                self._count_route(request.endpoint, hit is not None)
+                if hit is not None:
+                    status, mimetype, body = hit
+                    response = Response(body, status=status, mimetype=mimetype)
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                # Generations as of before the view ran: if a tag is invalidated
+                # while it runs, the stored entry is already stale and misses
+                entry_tags = tags(request.args) if callable(tags) else tags
+                generations = self.generations(entry_tags)
+                response = current_app.make_response(view(*args, **kwargs))
+                response.headers["X-Cache"] = "MISS"
+                if (response.status_code == 200 and not g.pop("response_cache_bypass", False)
+                        and response.mimetype == "application/json" and not response.is_streamed):
+                    entry_ttl = ttl(request.args) if callable(ttl) else ttl
+                    self.set(key, response.status_code, response.mimetype, response.get_data(),
+                             ttl=entry_ttl, tags=generations)
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk": bool(self.disk_dir),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "routes": {route: {"hits": h, "misses": m} for route, (h, m) in self._routes.items()},
+            }
+
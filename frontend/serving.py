@@ -0,0 +1,13 @@
+# serving.py — Process/thread layout shared by gunicorn.conf.py and app.py
+#
+# gunicorn.conf.py sizes the workers from these values and app.py sizes
+# whatever holds a thread for a long time (live streams) from them, so the
+# two cannot drift apart. Override through the environment.
+import os
+
+# gunicorn worker processes
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 2))
+# gthread threads per worker = concurrent requests per worker (live streams included)
+WEB_THREADS = int(os.getenv("WEB_THREADS", 16))
+# Threads per worker never handed to live streams, so control and API calls still get through
+WEB_RESERVED_THREADS = int(os.getenv("WEB_RESERVED_THREADS", 4))
@@ -1,5 +1,11 @@
 let chart;
 
+// Roughly one bucket per horizontal pixel of the chart, capped server-side
+function historyPoints() {
+    const canvas = document.getElementById("chart");
+    return Math.max(100, Math.min(2000, canvas ? canvas.clientWidth || 600 : 600));
+}
+
 function loadHistory() {
     const date = document.getElementById("datePick").value;
     const messageDiv = document.getElementById("chartMessage");
@@ -13,7 +19,7 @@ function loadHistory() {
     messageDiv.textContent = "Loading historical data...";
     messageDiv.style.color = "#4a90e2";
     
-    fetch(`/api/history?date=${date}`)
+    fetch(`/api/history/series?date=${date}&points=${historyPoints()}`)
         .then(r => r.json())
         .then(data => {
             if (data.error) {
@@ -22,7 +28,7 @@ function loadHistory() {
                 return;
             }
             
-            if (!data.timestamps || data.timestamps.length === 0) {
+            if (!data.t || data.t.length === 0) {
                 messageDiv.textContent = `No data found for ${date}. Try another date.`;
                 messageDiv.style.color = "#f39c12";
                 if (chart) {
@@ -32,7 +38,8 @@ function loadHistory() {
                 return;
             }
             
-            messageDiv.textContent = `Showing ${data.timestamps.length} data points for ${date}`;
+            const samples = data.count.reduce((a, b) => a + b, 0);
+            messageDiv.textContent = `Showing ${samples} readings in ${data.t.length} buckets of ${data.bucket_seconds}s for ${date}`;
             messageDiv.style.color = "#27ae60";
             
             // Destroy previous chart if exists
@@ -43,29 +50,29 @@ function loadHistory() {
             chart = new Chart(ctx, {
                 type: "line",
                 data: {
-                    labels: data.timestamps.map(ts => {
-                        // Format timestamps to show only time (HH:MM:SS)
-                        const d = new Date(ts);
+                    labels: data.t.map(ts => {
+                        // Bucket start (epoch seconds) shown as time (HH:MM:SS)
+                        const d = new Date(ts * 1000);
                         return d.toLocaleTimeString();
                     }),
                     datasets: [
                         {
                             label: "IR Sensor",
-                            data: data.ir,
+                            data: data.ir.avg,
                             borderColor: "#e74c3c",
                             backgroundColor: "rgba(231, 76, 60, 0.1)",
                             tension: 0.3
                         },
                         {
                             label: "Ultrasonic (cm)",
-                            data: data.ultrasonic,
+                            data: data.ultrasonic.avg,
                             borderColor: "#3498db",
                             backgroundColor: "rgba(52, 152, 219, 0.1)",
                             tension: 0.3
                         },
                         {
                             label: "Speed",
-                            data: data.speed,
+                            data: data.speed.avg,
                             borderColor: "#2ecc71",
                             backgroundColor: "rgba(46, 204, 113, 0.1)",
                             tension: 0.3
@@ -75,6 +82,8 @@ function loadHistory() {
                 options: {
                     responsive: true,
                     maintainAspectRatio: true,
+                    animation: false,
+                    spanGaps: true,
                     plugins: {
                         title: {
                             display: true,
@@ -0,0 +1,59 @@
+// ==========================================
+// LIVE TELEMETRY (Server-Sent Events with polling fallback)
+// ==========================================
+// subscribeLive(onData, onStatus, carId) -> { close() }
+//   onData(data)     called with the same object /api/live returns
+//   onStatus(state)  "live" | "polling" | "error"
+//   carId            optional; only that car's telemetry (default: newest car)
+function subscribeLive(onData, onStatus = () => {}, carId = null) {
+    const query = carId ? `?car=${encodeURIComponent(carId)}` : "";
+    let source = null;
+    let pollTimer = null;
+    let failures = 0;
+    let closed = false;
+
+    function startPolling() {
+        if (pollTimer || closed) return;
+        const poll = async () => {
+            try {
+                const res = await fetch(`/api/live${query}`);
+                onData(await res.json());
+                onStatus("polling");
+            } catch (err) {
+                console.error("Live poll error:", err);
+                onStatus("error");
+            }
+        };
+        poll();
+        pollTimer = setInterval(poll, 1500);
+    }
+
+    if (window.EventSource) {
+        source = new EventSource(`/api/live/stream${query}`);
+        source.addEventListener("telemetry", (e) => {
+            failures = 0;
+            onData(JSON.parse(e.data));
+            onStatus("live");
+        });
+        source.onerror = () => {
+            // EventSource reconnects by itself; give up after repeated failures
+            failures += 1;
+            onStatus("error");
+            if (failures >= 3) {
+                source.close();
+                source = null;
+                startPolling();
+            }
+        };
+    } else {
+        startPolling();
+    }
+
+    return {
+        close() {
+            closed = true;
+            if (source) source.close();
+            if (pollTimer) clearInterval(pollTimer);
+        }
+    };
+}
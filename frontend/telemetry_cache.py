@@ -0,0 +1,200 @@
+import json
+import ssl
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import paho.mqtt.client as mqtt
+    HAS_MQTT = True
+except Exception:
+    HAS_MQTT = False
+
+
+# Telemetry without a car_id comes from cars that predate fleet support
+DEFAULT_CAR_ID = "car1"
+
+
+def car_of(value):
+    if isinstance(value, dict):
+        return str(value.get("car_id") or DEFAULT_CAR_ID)
+    return DEFAULT_CAR_ID
+
+
+def sample_time(value):
+    """Epoch seconds from the sample's own "ts" (ISO, UTC when no offset), or None."""
+    ts = value.get("ts") if isinstance(value, dict) else None
+    if not isinstance(ts, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class TelemetryCache:
+    def __init__(self, username, key, feed, broker="io.adafruit.com", port=8883, history_size=300):
+        """
+        Background MQTT subscription to the telemetry feed.
+
+        Keeps the latest decoded value and a short history per car in memory
+        so /api/live can answer without calling Adafruit IO. All cars publish
+        to the same feed; values are routed by their "car_id" field. Each
+        entry is stored as (received_at, value), where received_at is the
+        sample's own "ts" when it has one (never later than arrival), so
+        the feed's last value replayed on connect keeps its real age.
+        """
+        self.username = username
+        self.key = key
+        self.topic = f"{username}/feeds/{feed}"
+        self.broker = broker
+        self.port = port
+        self._lock = threading.Lock()
+        self.history_size = history_size
+        self._latest = {}
+        self._history = {}
+        self._newest_car = None
+        self._listeners = []
+        # One-off reports on the same feed ({"event": ...}, e.g. profiler results)
+        self.events = deque(maxlen=50)
+        self.connected = False
+        # The next message is probably the replayed last value (see _on_connect)
+        self._replay = False
+        self.messages = 0
+        self.client = None
+
+    # --- lifecycle ---
+    def start(self):
+        if not HAS_MQTT:
+            print("TELEMETRY CACHE: paho-mqtt not installed, using REST only")
+            return False
+        if not self.username or not self.key:
+            print("TELEMETRY CACHE: missing AIO credentials, using REST only")
+            return False
+        self.client = mqtt.Client(client_id=f"smartcar-web-{int(time.time() * 1000) % 10**9}")
+        self.client.username_pw_set(self.username, self.key)
+        self.client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS_CLIENT)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+        try:
+            self.client.connect_async(self.broker, self.port, 60)
+            self.client.loop_start()
+            return True
+        except Exception as e:
+            print("TELEMETRY CACHE: connect error:", e)
+            return False
+
+    def stop(self):
+        if self.client is not None:
+            try:
+                self.client.loop_stop()
+                self.client.disconnect()
+            except Exception:
+                pass
+
+    # --- MQTT callbacks ---
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print("TELEMETRY CACHE: connect failed, rc =", rc)
+            return
+        self.connected = True
+        self._replay = True
+        client.subscribe(self.topic)
+        # Adafruit IO re-sends the feed's last value when "<topic>/get" is published
+        client.publish(self.topic + "/get", "")
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            payload = msg.payload.decode("utf-8")
+            value = json.loads(payload) if payload.strip().startswith("{") else payload
+        except Exception as e:
+            print("TELEMETRY CACHE: bad payload:", e)
+            return
+        replay, self._replay = self._replay, False
+        received_at = None
+        if replay and sample_time(value) is None:
+            # Possibly hours old and nothing says how old: never counts as fresh
+            received_at = 0.0
+        self.update(value, received_at)
+
+    # --- public interface ---
+    def add_listener(self, callback):
+        """callback(car_id, received_at, value) runs on every new value (on the MQTT thread)."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def update(self, value, received_at=None):
+        car_id = car_of(value)
+        now = time.time()
+        if received_at is None:
+            stamped = sample_time(value)
+            received_at = now if stamped is None else min(stamped, now)
+        entry = (received_at, value)
+        if isinstance(value, dict) and "event" in value:
+            # Not a telemetry sample: keep it out of the live state and history
+            with self._lock:
+                self.events.append((car_id,) + entry)
+            return
+        with self._lock:
+            latest = self._latest.get(car_id)
+            if latest is not None and received_at <= latest[0]:
+                # Replayed or out-of-order: already have this or something newer
+                return
+            self._latest[car_id] = entry
+            history = self._history.get(car_id)
+            if history is None:
+                history = self._history[car_id] = deque(maxlen=self.history_size)
+            history.append(entry)
+            self._newest_car = car_id
+            self.messages += 1
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(car_id, *entry)
+            except Exception as e:
+                print("TELEMETRY CACHE: listener error:", e)
+
+    def _entry(self, car_id):
+        with self._lock:
+            return self._latest.get(car_id or self._newest_car)
+
+    def latest(self, car_id=None, max_age=None):
+        """
+        Return the newest value for car_id (any car when None), or None if
+        missing or older than max_age seconds.
+        """
+        entry = self._entry(car_id)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry[0] > max_age:
+            return None
+        return entry[1]
+
+    def age(self, car_id=None):
+        entry = self._entry(car_id)
+        return None if entry is None else time.time() - entry[0]
+
+    def history(self, car_id=None, limit=None):
+        with self._lock:
+            items = list(self._history.get(car_id or self._newest_car, ()))
+        return items[-limit:] if limit else items
+
+    def recent_events(self, car_id=None, limit=None):
+        """[(car_id, received_at, value)] newest last, optionally for one car."""
+        with self._lock:
+            items = [e for e in self.events if car_id is None or e[0] == car_id]
+        return items[-limit:] if limit else items
+
+    def cars(self):
+        """{car_id: (received_at, value)} for every car seen so far."""
+        with self._lock:
+            return dict(self._latest)
@@ -0,0 +1,75 @@
+import os
+import threading
+
+from werkzeug.utils import safe_join
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except Exception:
+    HAS_PIL = False
+
+THUMB_WIDTHS = (160, 320, 640)
+
+
+class ThumbnailCache:
+    def __init__(self, source_dir, cache_dir, widths=THUMB_WIDTHS, quality=80):
+        """
+        On-demand JPEG thumbnails stored on disk.
+
+        Cache files are keyed by width, filename, source mtime and size, so an
+        overwritten capture gets a fresh thumbnail and stale ones are never
+        served. Generation for a given key happens once even under
+        concurrent requests (striped locks keep memory bounded).
+        """
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.widths = tuple(widths)
+        self.quality = quality
+        self._locks = [threading.Lock() for _ in range(32)]
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key_lock(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+    def get(self, filename, width):
+        """
+        Return (thumb_path, source_stat) or (None, None) if the source is
+        missing, the width is not allowed or Pillow is unavailable.
+        """
+        if width not in self.widths or not HAS_PIL:
+            return None, None
+        src = safe_join(self.source_dir, filename)
+        if src is None:
+            return None, None
+        try:
+            st = os.stat(src)
+        except OSError:
+            return None, None
+
+        base, _ = os.path.splitext(filename)
+        key = f"{base}-{st.st_mtime_ns}-{st.st_size}.jpg"
+        out_dir = os.path.join(self.cache_dir, str(width))
+        out = os.path.join(out_dir, key)
+        if os.path.exists(out):
+            return out, st
+
+        with self._key_lock((width, key)):
+            if not os.path.exists(out):
+                os.makedirs(out_dir, exist_ok=True)
+                with Image.open(src) as img:
+                    img.draft("RGB", (width, width))  # fast JPEG DCT downscale
+                    img = img.convert("RGB")
+                    img.thumbnail((width, width * 4))
+                    # Per process and thread: gunicorn workers may build the same thumbnail at once
+                    tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.part"
+                    try:
+                        img.save(tmp, format="JPEG", quality=self.quality, optimize=True)
+                        os.replace(tmp, out)
+                    except Exception:
+                        try:
+                            os.remove(tmp)
+                        except OSError:
+                            pass
+                        raise
+        return out, st
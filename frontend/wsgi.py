@@ -0,0 +1,8 @@
+# wsgi.py — Production entry point
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# `python app.py` is the development server only.
+from app import app
+
+application = app